@@ -1,5 +1,24 @@
 from django.apps import AppConfig
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.signals import post_migrate
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # База, данные которой лежат в кэше. Тестовая база создаётся
+        # под тем же псевдонимом, но с другим именем.
+        self.cached_database = connections[DEFAULT_DB_ALIAS].settings_dict[
+            'NAME'
+        ]
+        post_migrate.connect(self.clear_cache, sender=self)
+
+    def clear_cache(self, sender, using=DEFAULT_DB_ALIAS, **kwargs):
+        # Кэш общий и переживает перезапуск: после migrate и flush
+        # в нём могут остаться данные, которых уже нет в базе.
+        name = connections[using].settings_dict['NAME']
+        if using != DEFAULT_DB_ALIAS or name != self.cached_database:
+            return
+        from django.core.cache import cache
+        cache.clear()
@@ -0,0 +1,92 @@
+"""Двухуровневый кэш объектов: LRU процесса перед общим кэшем.
+
+Первый уровень — словарь в памяти процесса с ограниченным размером
+и коротким TTL: чтение не стоит даже обращения к общему кэшу.
+Второй уровень — общий кэш узла (settings.CACHES). delete() чистит
+оба уровня в текущем процессе и общий кэш для всех; в остальных
+процессах запись первого уровня доживает не дольше local_timeout.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache as default_cache
+
+from core.db import routers
+
+
+class LocalLRU:
+    def __init__(self, max_entries=1024, timeout=10):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TwoTierCache:
+    def __init__(self, prefix, local_timeout=10, shared_timeout=60 * 60,
+                 max_entries=1024, cache=None):
+        self.prefix = prefix
+        self.shared_timeout = shared_timeout
+        self.local = LocalLRU(max_entries, local_timeout)
+        self.cache = cache or default_cache
+
+    def make_key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def get_or_load(self, key, loader):
+        """Копия значения по ключу; при промахе обоих уровней — loader().
+
+        None не кэшируется, чтобы не запоминать ещё не созданные объекты.
+        Возвращается копия: изменения вызывающего (в том числе
+        закэшированные на модели связанные объекты) не попадают
+        в общий для процесса экземпляр.
+        """
+        key = self.make_key(key)
+        value = self.local.get(key)
+        if value is not None:
+            return copy.deepcopy(value)
+        value = self.cache.get(key)
+        if value is None:
+            # Попадёт в общий кэш: читается из основной базы.
+            with routers.primary():
+                value = loader()
+            if value is None:
+                return None
+            self.cache.set(key, value, self.shared_timeout)
+        self.local.set(key, value)
+        return copy.deepcopy(value)
+
+    def delete(self, *keys):
+        keys = [self.make_key(key) for key in keys if key is not None]
+        for key in keys:
+            self.local.delete(key)
+        self.cache.delete_many(keys)
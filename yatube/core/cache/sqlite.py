@@ -0,0 +1,238 @@
+"""Общий для всех процессов узла кэш в файле SQLite.
+
+В отличие от LocMemCache все воркеры gunicorn видят одни и те же
+записи, а внешний сервис не нужен. Файл работает в режиме WAL, чтобы
+чтения не ждали записи. Целые числа хранятся как есть, поэтому incr()
+выполняется одним UPDATE; остальные значения сериализуются pickle.
+При превышении MAX_ENTRIES удаляются давно не читавшиеся записи (LRU).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+# Время последнего чтения обновляется не чаще раза в столько секунд,
+# чтобы get() почти никогда не писал в файл.
+ACCESS_RESOLUTION = 60
+# Проверка размера выполняется раз в столько записей одного процесса.
+CULL_CHECK_EVERY = 100
+LIVE = '(expires IS NULL OR expires > ?)'
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=5, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def _dump(value):
+        if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _write(self, statements):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = [
+                connection.execute(sql, args) for sql, args in statements
+            ]
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self._writes += 1
+        if self._writes % CULL_CHECK_EVERY == 0:
+            self._cull()
+        return result
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._get_many([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys_map = {self.make_key(key, version=version): key for key in keys}
+        for key in keys_map:
+            self.validate_key(key)
+        found = self._get_many(list(keys_map))
+        return {keys_map[key]: value for key, value in found.items()}
+
+    def _get_many(self, keys):
+        if not keys:
+            return {}
+        now = time.time()
+        connection = self._connection()
+        placeholders = ', '.join('?' * len(keys))
+        rows = connection.execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({placeholders}) AND {LIVE}',
+            [*keys, now],
+        ).fetchall()
+        touched = [
+            (now, key) for key, _, accessed in rows
+            if now - accessed > ACCESS_RESOLUTION
+        ]
+        if touched:
+            connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', touched
+            )
+        return {key: self._load(value) for key, value, _ in rows}
+
+    def _set_statement(self, key, value, timeout):
+        return (
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?)',
+            (
+                key,
+                self._dump(value),
+                self.get_backend_timeout(timeout),
+                time.time(),
+            ),
+        )
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write([self._set_statement(key, value, timeout)])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        statements = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            statements.append(self._set_statement(key, value, timeout))
+        if statements:
+            self._write(statements)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        sql, args = self._set_statement(key, value, timeout)
+        _, cursor = self._write([
+            ('DELETE FROM cache WHERE key = ? AND NOT ' + LIVE,
+             (key, time.time())),
+            (sql.replace('OR REPLACE', 'OR IGNORE'), args),
+        ])
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor, = self._write([(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {LIVE}',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )])
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            updated = connection.execute(
+                f'UPDATE cache SET value = value + ? WHERE key = ? '
+                f"AND typeof(value) = 'integer' AND {LIVE}",
+                (delta, key, time.time()),
+            ).rowcount
+            if updated:
+                value, = connection.execute(
+                    'SELECT value FROM cache WHERE key = ?', (key,)
+                ).fetchone()
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        if not updated:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write([('DELETE FROM cache WHERE key = ?', (key,))])
+
+    def delete_many(self, keys, version=None):
+        statements = []
+        for key in keys:
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            statements.append(('DELETE FROM cache WHERE key = ?', (key,)))
+        if statements:
+            self._write(statements)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._connection().execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {LIVE}',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def _cull(self):
+        connection = self._connection()
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            ' SELECT key FROM cache ORDER BY accessed LIMIT ?'
+            ')',
+            (count - self._max_entries + count // self._cull_frequency,),
+        )
+
+    def close(self, **kwargs):
+        # Соединение переиспользуется между запросами своего потока.
+        pass
@@ -0,0 +1,61 @@
+"""Кэш со stale-while-revalidate и единственным пересчётом.
+
+Запись хранится до жёсткого TTL вместе с моментом, до которого она
+свежая (мягкий TTL). Устаревшую запись пересчитывает один процесс,
+захвативший блокировку в кэше, а остальные в это время отдают старое
+значение. При полном промахе остальные процессы недолго ждут результат
+вместо того, чтобы считать одно и то же одновременно.
+"""
+import time
+
+from django.core.cache import cache as default_cache
+
+HARD_TTL_FACTOR = 6
+LOCK_TIMEOUT = 30
+MISS_WAIT = 2
+WAIT_STEP = 0.05
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _store(cache, key, value, soft_ttl, hard_ttl):
+    cache.set(key, (value, time.time() + soft_ttl), hard_ttl)
+    return value
+
+
+def get_or_compute(key, compute, soft_ttl, hard_ttl=None, cache=None):
+    """Значение по ключу; compute() вызывается не чаще одного раза сразу.
+
+    soft_ttl — сколько секунд значение считается свежим, hard_ttl —
+    сколько его можно отдавать устаревшим (по умолчанию
+    soft_ttl * HARD_TTL_FACTOR).
+    """
+    cache = cache or default_cache
+    if hard_ttl is None:
+        hard_ttl = soft_ttl * HARD_TTL_FACTOR
+    lock_key = _lock_key(key)
+    entry = cache.get(key)
+    if entry is not None:
+        value, fresh_until = entry
+        if time.time() < fresh_until or not cache.add(
+            lock_key, 1, LOCK_TIMEOUT
+        ):
+            return value
+        try:
+            return _store(cache, key, compute(), soft_ttl, hard_ttl)
+        finally:
+            cache.delete(lock_key)
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            return _store(cache, key, compute(), soft_ttl, hard_ttl)
+        finally:
+            cache.delete(lock_key)
+    deadline = time.time() + MISS_WAIT
+    while time.time() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return compute()
@@ -0,0 +1,126 @@
+"""Обслуживание SQLite без остановки сайта.
+
+Все операции выполняются на рабочем соединении и не держат
+блокировку записи дольше одного шага: incremental_vacuum освобождает
+страницы порциями по VACUUM_STEP, резервная копия снимается online
+backup API порциями страниц; между порциями делаются паузы, в которые
+пишут другие процессы.
+"""
+import os
+import sqlite3
+import time
+
+from django.db import DatabaseError, connection
+
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+# auto_vacuum = INCREMENTAL
+INCREMENTAL = 2
+# Страниц за один шаг incremental_vacuum.
+VACUUM_STEP = 256
+
+
+def _fetch(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def pragma(name):
+    return _fetch(f'PRAGMA {name}')[0][0]
+
+
+def enable_incremental_vacuum():
+    """Переводит файл в auto_vacuum=INCREMENTAL.
+
+    Требует полного VACUUM, который блокирует базу; нужен один раз.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
+
+
+def incremental_vacuum(pages=VACUUM_STEP, sleep=0.05):
+    """Возвращает ОС все свободные страницы шагами по pages страниц.
+
+    Каждый шаг — отдельная короткая транзакция, между шагами пауза
+    sleep секунд для других писателей. Возвращает число страниц.
+    """
+    if pragma('auto_vacuum') != INCREMENTAL:
+        return None
+    if pages <= 0:
+        raise ValueError('Шаг должен быть больше нуля')
+    before = remaining = pragma('freelist_count')
+    while remaining:
+        _fetch(f'PRAGMA incremental_vacuum({int(pages)})')
+        left = pragma('freelist_count')
+        if left >= remaining:
+            # Страницы не освобождаются: не крутимся впустую.
+            break
+        remaining = left
+        if remaining and sleep:
+            time.sleep(sleep)
+    return before - remaining
+
+
+def optimize(full=False):
+    """Обновляет статистику планировщика (sqlite_stat1)."""
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE' if full else 'PRAGMA optimize')
+
+
+def checkpoint(mode='PASSIVE'):
+    """Переносит WAL в основной файл: (занято, страниц в WAL, перенесено)."""
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f'Режим должен быть одним из {CHECKPOINT_MODES}')
+    return tuple(_fetch(f'PRAGMA wal_checkpoint({mode})')[0])
+
+
+def backup(path, pages=256, sleep=0.05, progress=None):
+    """Горячая копия базы в path порциями по pages страниц.
+
+    Копия пишется во временный файл и переименовывается, поэтому
+    по пути path никогда не лежит недописанный файл.
+    """
+    connection.ensure_connection()
+    partial = f'{path}.part'
+    target = sqlite3.connect(partial)
+    try:
+        with target:
+            connection.connection.backup(
+                target, pages=pages, sleep=sleep, progress=progress
+            )
+    finally:
+        target.close()
+    os.replace(partial, path)
+
+
+def table_sizes():
+    """[(имя, байт)] таблиц и индексов по убыванию размера или None,
+    если SQLite собран без dbstat."""
+    try:
+        return _fetch(
+            'SELECT name, SUM(pgsize) FROM dbstat '
+            'GROUP BY name ORDER BY 2 DESC'
+        )
+    except DatabaseError:
+        return None
+
+
+def index_stats():
+    """[(индекс, таблица, статистика)] из sqlite_stat1.
+
+    SQLite не считает обращения к индексам; статистика показывает
+    число строк и среднюю выборку на ключ, по ней видно бесполезные
+    (неселективные) индексы. Индексы без статистики — с None.
+    """
+    indexes = _fetch(
+        "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' "
+        'ORDER BY tbl_name, name'
+    )
+    try:
+        stats = dict(_fetch(
+            'SELECT idx, stat FROM sqlite_stat1 WHERE idx IS NOT NULL'
+        ))
+    except DatabaseError:
+        stats = {}
+    return [(name, table, stats.get(name)) for name, table in indexes]
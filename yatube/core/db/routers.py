@@ -0,0 +1,76 @@
+"""Маршрутизация чтений на реплики с возвратом к основной базе.
+
+Запись всегда идёт в default, чтение — в случайную базу из
+settings.DATABASE_REPLICAS. Поток закрепляется за основной базой
+на время запроса, который пишет или недавно писал (см.
+core.middleware.PrimaryStickinessMiddleware), и внутри транзакции
+на основной базе: реплика могла ещё не получить эти изменения.
+
+Внутри primary() читается основная база и без закрепления: так
+считается всё, что сохраняется в общий кэш. Иначе отстающая
+реплика записала бы старые строки под ключом нового поколения.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+
+def pin():
+    _state.pinned = True
+
+
+def unpin():
+    _state.pinned = False
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False)
+
+
+@contextmanager
+def primary():
+    """Чтения внутри блока идут в основную базу."""
+    pinned = is_pinned()
+    pin()
+    try:
+        yield
+    finally:
+        _state.pinned = pinned
+
+
+def stick(request):
+    """Отмечает запрос как пишущий: дальше и в следующие секунды
+    этот клиент читает из основной базы."""
+    request.stick_to_primary = True
+    pin()
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if (
+            not aliases
+            or is_pinned()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же строки, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
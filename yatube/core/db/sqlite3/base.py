@@ -0,0 +1,62 @@
+"""SQLite с настройками для продакшена.
+
+На каждое новое соединение выполняются PRAGMA из DEFAULT_PRAGMAS,
+их можно переопределить в OPTIONS['pragmas']. WAL позволяет читать
+во время записи. Сколько писатель ждёт блокировку вместо немедленной
+ошибки «database is locked», задаёт OPTIONS['timeout'] в секундах:
+sqlite3.connect сам выставляет по нему busy_timeout, поэтому PRAGMA
+busy_timeout здесь нет — она перекрыла бы это значение.
+
+OPTIONS['transaction_mode'] задаёт вид BEGIN для atomic(). При
+IMMEDIATE блокировка записи берётся в начале транзакции: обычный
+BEGIN, начавший с чтения, не может дождаться её позже и сразу
+падает с SQLITE_BUSY.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    # Действует только для пустого файла, поэтому идёт до journal_mode;
+    # существующий переводится sqlite_maintenance
+    # --enable-incremental-vacuum.
+    'auto_vacuum': 'INCREMENTAL',
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в килобайтах, а не в страницах.
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+def apply_pragmas(connection, pragmas):
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    pragmas = DEFAULT_PRAGMAS
+    transaction_mode = None
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = {**DEFAULT_PRAGMAS, **kwargs.pop('pragmas', {})}
+        mode = kwargs.pop('transaction_mode', None)
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode должен быть одним из {TRANSACTION_MODES}'
+            )
+        self.transaction_mode = mode and mode.upper()
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        apply_pragmas(connection, self.pragmas)
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,139 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.db.sqlite3.base import DEFAULT_PRAGMAS, apply_pragmas
+
+SCHEMA = (
+    'CREATE TABLE post ('
+    ' id INTEGER PRIMARY KEY, comments_count INTEGER NOT NULL DEFAULT 0)',
+    'CREATE TABLE comment ('
+    ' id INTEGER PRIMARY KEY, post_id INTEGER NOT NULL,'
+    ' text TEXT NOT NULL, created REAL NOT NULL)',
+    'CREATE INDEX comment_post_created ON comment (post_id, created)',
+)
+POSTS = 100
+# Как у django.db.backends.sqlite3 без настроек: журнал DELETE,
+# synchronous=FULL, обычный BEGIN и таймаут sqlite3.connect по умолчанию.
+BASELINE = {'pragmas': {}, 'begin': 'BEGIN', 'timeout': 5}
+TUNED = {'pragmas': DEFAULT_PRAGMAS, 'begin': 'BEGIN IMMEDIATE', 'timeout': 20}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite при параллельных '
+        'чтениях и записях без настроек и с настройками core.db.sqlite3.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        for name, profile in (('baseline', BASELINE), ('tuned', TUNED)):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                result = run(path, profile, **options)
+            self.stdout.write(
+                f'{name}: чтений/с {result["reads"]:.0f}, '
+                f'записей/с {result["writes"]:.0f}, '
+                f'ошибок блокировки {result["errors"]}'
+            )
+
+
+def _connect(path, profile):
+    connection = sqlite3.connect(
+        path, timeout=profile['timeout'], isolation_level=None,
+        check_same_thread=False,
+    )
+    apply_pragmas(connection, profile['pragmas'])
+    return connection
+
+
+def _read(connection):
+    connection.execute(
+        'SELECT id, text FROM comment WHERE post_id = ? '
+        'ORDER BY created DESC LIMIT 20',
+        (random.randint(1, POSTS),),
+    ).fetchall()
+
+
+def _write(connection, begin):
+    # Как add_comment: чтение поста, вставка и сдвиг счётчика.
+    post_id = random.randint(1, POSTS)
+    connection.execute(begin)
+    try:
+        connection.execute('SELECT id FROM post WHERE id = ?', (post_id,))
+        connection.execute(
+            'INSERT INTO comment (post_id, text, created) VALUES (?, ?, ?)',
+            (post_id, 'x' * 200, time.time()),
+        )
+        connection.execute(
+            'UPDATE post SET comments_count = comments_count + 1 '
+            'WHERE id = ?',
+            (post_id,),
+        )
+        connection.execute('COMMIT')
+    except sqlite3.OperationalError:
+        connection.execute('ROLLBACK')
+        raise
+
+
+def run(path, profile, seconds, readers, writers, **kwargs):
+    """Нагрузка в потоках; возвращает операции в секунду и число ошибок."""
+    setup = _connect(path, profile)
+    for statement in SCHEMA:
+        setup.execute(statement)
+    setup.executemany(
+        'INSERT INTO post (id) VALUES (?)',
+        ((pk,) for pk in range(1, POSTS + 1)),
+    )
+    setup.close()
+
+    totals = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def worker(kind):
+        connection = _connect(path, profile)
+        done = errors = 0
+        while not stop.is_set():
+            try:
+                if kind == 'reads':
+                    _read(connection)
+                else:
+                    _write(connection, profile['begin'])
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        connection.close()
+        with lock:
+            totals[kind] += done
+            totals['errors'] += errors
+
+    threads = [
+        threading.Thread(target=worker, args=('reads',))
+        for _ in range(readers)
+    ] + [
+        threading.Thread(target=worker, args=('writes',))
+        for _ in range(writers)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    return {
+        'reads': totals['reads'] / elapsed,
+        'writes': totals['writes'] / elapsed,
+        'errors': totals['errors'],
+    }
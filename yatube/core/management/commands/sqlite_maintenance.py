@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.db import maintenance
+
+
+class Command(BaseCommand):
+    help = (
+        'Обслуживание SQLite на ходу: incremental vacuum, статистика '
+        'планировщика, checkpoint WAL, горячая копия и отчёт о размерах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vacuum-pages', type=int, default=maintenance.VACUUM_STEP,
+            help='Свободных страниц за один шаг incremental vacuum.',
+        )
+        parser.add_argument(
+            '--vacuum-pause', type=float, default=0.05,
+            help='Пауза между шагами incremental vacuum в секундах.',
+        )
+        parser.add_argument(
+            '--enable-incremental-vacuum', action='store_true',
+            help='Один раз перевести файл в auto_vacuum=INCREMENTAL '
+                 '(полный VACUUM, блокирует базу).',
+        )
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Полный ANALYZE вместо PRAGMA optimize.',
+        )
+        parser.add_argument(
+            '--checkpoint', default='PASSIVE',
+            choices=maintenance.CHECKPOINT_MODES,
+        )
+        parser.add_argument(
+            '--backup', metavar='PATH',
+            help='Снять горячую копию базы в файл.',
+        )
+        parser.add_argument(
+            '--backup-step', type=int, default=256,
+            help='Страниц за один шаг копирования.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Поддерживается только SQLite.')
+        if options['enable_incremental_vacuum']:
+            maintenance.enable_incremental_vacuum()
+            self.stdout.write('auto_vacuum = INCREMENTAL')
+        if options['vacuum_pages'] <= 0:
+            raise CommandError('--vacuum-pages должен быть больше нуля.')
+        freed = maintenance.incremental_vacuum(
+            options['vacuum_pages'], options['vacuum_pause']
+        )
+        if freed is None:
+            self.stdout.write(
+                'incremental vacuum пропущен: auto_vacuum не INCREMENTAL'
+            )
+        else:
+            self.stdout.write(f'Освобождено страниц: {freed}')
+        maintenance.optimize(full=options['analyze'])
+        self.stdout.write('Статистика планировщика обновлена')
+        busy, log, done = maintenance.checkpoint(options['checkpoint'])
+        self.stdout.write(
+            f'Checkpoint {options["checkpoint"]}: '
+            f'перенесено {done} из {log} страниц WAL'
+            + (' (занято читателями)' if busy else '')
+        )
+        if options['backup']:
+            maintenance.backup(options['backup'], options['backup_step'])
+            self.stdout.write(f'Копия: {options["backup"]}')
+        self.report()
+        self.stdout.write(self.style.SUCCESS('Обслуживание завершено'))
+
+    def report(self):
+        sizes = maintenance.table_sizes()
+        if sizes is not None:
+            self.stdout.write('Размеры таблиц и индексов:')
+            for name, size in sizes:
+                self.stdout.write(f'  {name}: {size // 1024} КиБ')
+        self.stdout.write('Индексы (sqlite_stat1: строк, строк на ключ):')
+        for name, table, stat in maintenance.index_stats():
+            self.stdout.write(f'  {table}.{name}: {stat or "нет статистики"}')
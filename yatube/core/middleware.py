@@ -0,0 +1,36 @@
+from django.conf import settings
+
+from core.db import routers
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class PrimaryStickinessMiddleware:
+    """Read-your-writes при чтении с реплик.
+
+    Небезопасные запросы и запросы, вызвавшие routers.stick(), ставят
+    cookie на REPLICA_STICKY_SECONDS; пока она есть, чтения клиента
+    идут в основную базу и сразу видят его изменения.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cookie = settings.REPLICA_STICKY_COOKIE
+        request.stick_to_primary = request.method not in SAFE_METHODS
+        if request.stick_to_primary or cookie in request.COOKIES:
+            routers.pin()
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.unpin()
+        if request.stick_to_primary:
+            response.set_cookie(
+                cookie,
+                '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
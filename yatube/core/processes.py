@@ -0,0 +1,22 @@
+"""Пул процессов для тяжёлой работы с картинками вне запроса."""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections
+
+
+def _init_worker():
+    # Соединения родителя после fork не используются.
+    connections.close_all()
+
+
+def fork_pool(workers):
+    """Пул на fork: воркеры наследуют настроенный Django.
+
+    Соединения с базой каждый воркер открывает сам.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('fork'),
+        initializer=_init_worker,
+    )
@@ -0,0 +1,63 @@
+"""Бюджет SQL-запросов для представлений.
+
+Декоратор query_budget(n) считает запросы, выполненные представлением
+вместе с отрисовкой шаблона, и при превышении бюджета пишет ошибку
+в лог, а при QUERY_BUDGET_STRICT = True выбрасывает исключение —
+так N+1 ловится тестами, а не в продакшене.
+"""
+import functools
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+def check_budget(name, queries, budget):
+    if len(queries) <= budget:
+        return
+    message = (
+        f'{name}: {len(queries)} SQL-запросов при бюджете {budget}\n'
+        + '\n'.join(queries)
+    )
+    if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+        raise QueryBudgetExceeded(message)
+    logger.error(message)
+
+
+def query_budget(budget):
+    """Ограничивает число SQL-запросов представления."""
+    def decorator(view):
+        name = f'{view.__module__}.{view.__qualname__}'
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            counter = QueryCounter()
+            # Считаются запросы ко всем базам, включая реплики.
+            with ExitStack() as stack:
+                for db in connections.all():
+                    stack.enter_context(db.execute_wrapper(counter))
+                response = view(request, *args, **kwargs)
+                if not getattr(response, 'is_rendered', True):
+                    response.render()
+            check_budget(name, counter.queries, budget)
+            return response
+
+        wrapper.query_budget = budget
+        return wrapper
+    return decorator
@@ -0,0 +1,65 @@
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+
+from core.cache.swr import get_or_compute
+from core.db import routers
+
+register = template.Library()
+
+
+class SWRCacheNode(template.Node):
+    def __init__(self, nodelist, soft_ttl, fragment_name, vary_on,
+                 hard_ttl=None):
+        self.nodelist = nodelist
+        self.soft_ttl = soft_ttl
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+        self.hard_ttl = hard_ttl
+
+    def render(self, context):
+        soft_ttl = int(self.soft_ttl.resolve(context))
+        hard_ttl = self.hard_ttl and int(self.hard_ttl.resolve(context))
+        try:
+            fragment_cache = caches['template_fragments']
+        except InvalidCacheBackendError:
+            fragment_cache = caches['default']
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return get_or_compute(
+            make_template_fragment_key(self.fragment_name, vary_on),
+            lambda: self._render(context),
+            soft_ttl,
+            hard_ttl,
+            cache=fragment_cache,
+        )
+
+    def _render(self, context):
+        # Фрагмент живёт в общем кэше, реплика могла отстать.
+        with routers.primary():
+            return self.nodelist.render(context)
+
+
+@register.tag
+def swrcache(parser, token):
+    """Аналог {% cache %} с мягким и жёстким TTL.
+
+    {% swrcache <soft_ttl> <fragment_name> [var ...] [hard=<ttl>] %}
+    """
+    nodelist = parser.parse(('endswrcache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.'
+        )
+    hard_ttl = None
+    if len(tokens) > 3 and tokens[-1].startswith('hard='):
+        hard_ttl = parser.compile_filter(tokens[-1][len('hard='):])
+        tokens = tokens[:-1]
+    return SWRCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(t) for t in tokens[3:]],
+        hard_ttl,
+    )
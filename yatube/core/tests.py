@@ -0,0 +1,318 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+from django.template import Context, Template
+from django.test import (
+    Client, SimpleTestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+from .cache import swr
+from .cache.local import TwoTierCache
+from .cache.sqlite import SQLiteCache
+from .db import maintenance
+from .db.sqlite3.base import DEFAULT_PRAGMAS
+
+
+class SWRCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fresh_value_is_not_recomputed(self):
+        """Свежее значение берётся из кэша."""
+        compute = mock.Mock(return_value='value')
+        swr.get_or_compute('key', compute, 60)
+        self.assertEqual(swr.get_or_compute('key', compute, 60), 'value')
+        compute.assert_called_once()
+
+    def test_stale_value_served_while_locked(self):
+        """Пока другой процесс пересчитывает, отдаётся старое значение."""
+        cache.set('key', ('old', time.time() - 1), 60)
+        cache.add('key:lock', 1)
+        compute = mock.Mock(return_value='new')
+        self.assertEqual(swr.get_or_compute('key', compute, 60), 'old')
+        compute.assert_not_called()
+
+    def test_stale_value_refreshed_by_lock_owner(self):
+        """Процесс, взявший блокировку, обновляет значение."""
+        cache.set('key', ('old', time.time() - 1), 60)
+        self.assertEqual(
+            swr.get_or_compute('key', lambda: 'new', 60), 'new'
+        )
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_template_tag(self):
+        """{% swrcache %} кэширует фрагмент как {% cache %}."""
+        template = Template(
+            '{% load swr_cache %}'
+            '{% swrcache 60 fragment name hard=120 %}{{ value }}'
+            '{% endswrcache %}'
+        )
+        context = {'name': 'a', 'value': 1}
+        self.assertEqual(template.render(Context(context)), '1')
+        context['value'] = 2
+        self.assertEqual(template.render(Context(context)), '1')
+        context['name'] = 'b'
+        self.assertEqual(template.render(Context(context)), '2')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = SQLiteCache(
+            os.path.join(self.directory, 'cache.sqlite3'),
+            {'OPTIONS': {'MAX_ENTRIES': 10}},
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_values_and_ttl(self):
+        """Значения любых типов читаются обратно, истёкшие — нет."""
+        self.cache.set('list', [1, 'a'])
+        self.cache.set('gone', 1, timeout=-1)
+        self.assertEqual(self.cache.get('list'), [1, 'a'])
+        self.assertIsNone(self.cache.get('gone'))
+        self.assertTrue(self.cache.add('gone', 2))
+        self.assertFalse(self.cache.add('gone', 3))
+        self.assertEqual(self.cache.get('gone'), 2)
+
+    def test_incr_is_atomic_update(self):
+        """incr меняет число в базе, на отсутствующем ключе — ValueError."""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.cache.decr('counter'), 5)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_bulk_operations(self):
+        """get_many/set_many/delete_many работают одним запросом."""
+        self.cache.set_many({'a': 1, 'b': 'two'})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 'two'}
+        )
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+
+    def test_shared_between_instances(self):
+        """Другой экземпляр (процесс) видит те же записи."""
+        self.cache.set('shared', 'value')
+        other = SQLiteCache(self.cache._path, {})
+        self.assertEqual(other.get('shared'), 'value')
+
+    def test_lru_cull(self):
+        """Сверх MAX_ENTRIES вытесняются давно не читавшиеся записи."""
+        for i in range(20):
+            self.cache.set(f'key{i}', i)
+        self.cache._cull()
+        self.assertLessEqual(
+            len(self.cache.get_many([f'key{i}' for i in range(20)])), 10
+        )
+
+
+class CacheIsolationTests(SimpleTestCase):
+    def test_tests_use_own_cache_file(self):
+        location = settings.CACHES['default']['LOCATION']
+        self.assertNotEqual(
+            location, os.path.join(settings.BASE_DIR, 'cache.sqlite3')
+        )
+
+    def test_migrating_other_database_keeps_cache(self):
+        """post_migrate чистит кэш только для базы, чьи данные в нём."""
+        config = apps.get_app_config('core')
+        cache.set('key', 'value')
+        config.clear_cache(sender=config, using='default')
+        self.assertEqual(cache.get('key'), 'value')
+        test_database = connections['default'].settings_dict['NAME']
+        with mock.patch.object(config, 'cached_database', test_database):
+            config.clear_cache(sender=config, using='default')
+        self.assertIsNone(cache.get('key'))
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.objects = TwoTierCache('test', max_entries=2)
+
+    def test_second_read_hits_local_tier(self):
+        """Повторное чтение не доходит ни до загрузчика, ни до кэша."""
+        loader = mock.Mock(return_value='value')
+        self.objects.get_or_load('a', loader)
+        with mock.patch.object(self.objects, 'cache') as shared:
+            self.assertEqual(self.objects.get_or_load('a', loader), 'value')
+        shared.get.assert_not_called()
+        loader.assert_called_once()
+
+    def test_callers_get_copies(self):
+        """Изменение полученного значения не портит закэшированное."""
+        self.objects.get_or_load('a', lambda: {'count': 0})
+        self.objects.get_or_load('a', lambda: None)['count'] = 1
+        self.assertEqual(self.objects.get_or_load('a', lambda: None), {
+            'count': 0,
+        })
+
+    def test_delete_clears_both_tiers(self):
+        """После delete значение загружается заново."""
+        self.objects.get_or_load('a', lambda: 'old')
+        self.objects.delete('a')
+        self.assertEqual(self.objects.get_or_load('a', lambda: 'new'), 'new')
+
+    def test_local_tier_is_bounded(self):
+        """Локальный уровень хранит не больше max_entries записей."""
+        for key in 'abc':
+            self.objects.get_or_load(key, lambda: key)
+        self.assertIsNone(self.objects.local.get('test:a'))
+        self.assertEqual(self.objects.local.get('test:c'), 'c')
+
+
+class SQLiteBackendTests(TransactionTestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_to_connection(self):
+        """Новое соединение получает PRAGMA из настроек бэкенда."""
+        connection.close()
+        # Ожидание блокировки берётся из OPTIONS['timeout'] в секундах.
+        self.assertEqual(
+            self.pragma('busy_timeout'),
+            connection.settings_dict['OPTIONS']['timeout'] * 1000,
+        )
+        self.assertEqual(
+            self.pragma('cache_size'), DEFAULT_PRAGMAS['cache_size']
+        )
+        # 2 — MEMORY.
+        self.assertEqual(self.pragma('temp_store'), 2)
+
+    def test_atomic_begins_immediate(self):
+        """atomic() сразу берёт блокировку записи."""
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                pass
+        self.assertEqual(queries.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_benchmark_command(self):
+        """Бенчмарк сравнивает базовую и настроенную конфигурации."""
+        out = StringIO()
+        call_command(
+            'sqlite_benchmark', seconds=0.2, readers=1, writers=1, stdout=out
+        )
+        self.assertIn('baseline:', out.getvalue())
+        self.assertIn('tuned:', out.getvalue())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='reader')
+        self.author = get_user_model().objects.create_user(username='writer')
+        self.post = Post.objects.create(author=self.author, text='text')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def tables_read(self, alias, url):
+        with CaptureQueriesContext(connections[alias]) as queries:
+            self.client.get(url)
+        return ' '.join(query['sql'] for query in queries.captured_queries)
+
+    def test_reads_go_to_replica(self):
+        """Страницы без недавних записей читают посты с реплики."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.assertIn('"posts_post"', self.tables_read('replica', url))
+        self.assertNotIn('"posts_post"', self.tables_read('default', url))
+
+    def test_cached_fragments_read_primary(self):
+        """Списки для общего кэша читаются из основной базы."""
+        url = reverse('posts:index')
+        for query in ('', '?after=start'):
+            with self.subTest(query=query):
+                cache.clear()
+                self.assertNotIn(
+                    '"posts_post"', self.tables_read('replica', url + query)
+                )
+                cache.clear()
+                self.assertIn(
+                    '"posts_post"', self.tables_read('default', url + query)
+                )
+
+    def test_reads_stick_to_primary_after_write(self):
+        """После комментария клиент читает из основной базы."""
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'comment'},
+        )
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.assertEqual(self.tables_read('replica', url), '')
+        self.assertIn('"posts_comment"', self.tables_read('default', url))
+
+    def test_follow_sticks_to_primary(self):
+        """GET-подписка тоже закрепляет клиента за основной базой."""
+        response = self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+
+class SQLiteMaintenanceTests(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_maintenance_with_backup(self):
+        """Команда обслуживания снимает рабочую копию базы."""
+        author = get_user_model().objects.create_user(username='writer')
+        Post.objects.create(author=author, text='text')
+        path = os.path.join(self.directory, 'backup.sqlite3')
+        out = StringIO()
+        call_command(
+            'sqlite_maintenance', backup=path, backup_step=1, stdout=out
+        )
+        self.assertIn('Обслуживание завершено', out.getvalue())
+        copy = sqlite3.connect(path)
+        try:
+            total, = copy.execute('SELECT COUNT(*) FROM posts_post').fetchone()
+        finally:
+            copy.close()
+        self.assertEqual(total, 1)
+
+    def test_incremental_vacuum_runs_in_steps(self):
+        """Свободные страницы возвращаются шагами, а не одним PRAGMA."""
+        freelist = [10]
+        statements = []
+
+        def pragma(name):
+            return {
+                'auto_vacuum': maintenance.INCREMENTAL,
+                'freelist_count': freelist[0],
+            }[name]
+
+        def fetch(sql):
+            statements.append(sql)
+            freelist[0] = max(freelist[0] - 4, 0)
+
+        with mock.patch.object(maintenance, 'pragma', pragma), \
+                mock.patch.object(maintenance, '_fetch', fetch):
+            freed = maintenance.incremental_vacuum(4, sleep=0)
+        self.assertEqual(freed, 10)
+        self.assertEqual(statements, ['PRAGMA incremental_vacuum(4)'] * 3)
@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
 
-from .models import Group, Post
+from . import deletion
+from .models import Group, PendingDeletion, Post, User
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -30,6 +32,66 @@ class GroupAdmin(admin.ModelAdmin):
     search_fields = ('description',)
     list_filter = ('slug',)
     empty_value_display = '-пусто-'
+    actions = ('schedule_deletion',)
+
+    def schedule_deletion(self, request, queryset):
+        for group in queryset:
+            deletion.schedule(group)
+        self.message_user(
+            request,
+            'Группы поставлены в очередь; удалит команда process_deletions.',
+        )
+    schedule_deletion.short_description = 'Удалить в фоне по частям'
 
 
 admin.site.register(Group, GroupAdmin)
+
+
+class ChunkedDeletionUserAdmin(UserAdmin):
+    """Пользователи удаляются только в фоне по частям.
+
+    Обычное удаление собирает весь каскад в памяти и удаляет его одной
+    долгой транзакцией, поэтому оно и delete_selected отключены.
+    """
+    actions = ('schedule_deletion',)
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def schedule_deletion(self, request, queryset):
+        for user in queryset:
+            deletion.schedule(user)
+        self.message_user(
+            request,
+            'Пользователи отключены и поставлены в очередь; '
+            'удалит команда process_deletions.',
+        )
+    schedule_deletion.short_description = 'Удалить в фоне по частям'
+
+
+# UserAdmin при импорте уже зарегистрирован django.contrib.auth.
+admin.site.unregister(User)
+admin.site.register(User, ChunkedDeletionUserAdmin)
+
+
+class PendingDeletionAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'kind',
+        'object_id',
+        'created',
+        'removed',
+    )
+    list_filter = ('kind',)
+
+    def save_model(self, request, obj, form, change):
+        # Через schedule(), чтобы пользователь сразу потерял доступ.
+        model, _ = deletion.STEPS[obj.kind]
+        target = model.objects.filter(pk=obj.object_id).first()
+        if target is None:
+            super().save_model(request, obj, form, change)
+        else:
+            obj.pk = deletion.schedule(target).pk
+
+
+admin.site.register(PendingDeletion, PendingDeletionAdmin)
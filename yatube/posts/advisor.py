@@ -0,0 +1,221 @@
+"""Поиск недостающих индексов по планам запросов.
+
+Страницы приложения запрашиваются тестовым клиентом на текущей базе,
+для каждого SELECT снимается EXPLAIN QUERY PLAN. Полный просмотр
+таблицы (SCAN без индекса) и временная сортировка (TEMP B-TREE)
+считаются проблемой. Для таблиц posts по условию WHERE и ORDER BY
+запроса предлагается составной индекс: сначала столбцы сравнения
+на равенство, затем столбцы сортировки.
+
+Работает только с SQLite: формат плана у других СУБД другой.
+"""
+import re
+from collections import namedtuple
+
+from django.apps import apps
+from django.db import connection, models, transaction
+from django.db.migrations import AddIndex
+from django.db.models import Max
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Follow, Group, Post, User, UserStats
+from .views import POSTS_PER_PAGE
+
+APP_LABEL = 'posts'
+FULL_SCAN = 'full scan'
+TEMP_SORT = 'temp sort'
+REPLAY_SETTINGS = {
+    # Кэш страниц и счётчиков скрыл бы запросы.
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        },
+    },
+    'ALLOWED_HOSTS': ['testserver'],
+}
+
+Finding = namedtuple('Finding', 'url sql plan problems')
+Suggestion = namedtuple('Suggestion', 'model fields')
+
+SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+EQUALS_RE = re.compile(r'"(\w+)"\."(\w+)" (?:= |IN \()')
+ORDER_RE = re.compile(r'(?:"(\w+)"\.)?"(\w+)"(?: (ASC|DESC))?')
+ALIAS_RE = re.compile(r'"(\w+)"\."(\w+)" AS "(\w+)"')
+
+
+def sample_urls():
+    """Страницы для проверки на самых крупных объектах базы."""
+    url = reverse('posts:index')
+    urls = [url, _last_page(url, Post.objects.count())]
+    group = Group.objects.order_by('-posts_count').first()
+    if group is not None:
+        url = reverse('posts:group_list', args=[group.slug])
+        urls += [url, _last_page(url, group.posts_count)]
+    stats = UserStats.objects.select_related('user')
+    author = stats.order_by('-posts_count').first()
+    if author is not None:
+        url = reverse('posts:profile', args=[author.user.username])
+        urls += [url, _last_page(url, author.posts_count)]
+    post = Post.objects.order_by('-comments_count').first()
+    if post is not None:
+        urls += [
+            reverse('posts:post_detail', args=[post.pk]),
+            reverse('posts:post_comments', args=[post.pk]),
+        ]
+    urls.append(reverse('posts:follow_index'))
+    return urls
+
+
+def _last_page(url, total):
+    return f'{url}?page={max(total - 1, 0) // POSTS_PER_PAGE + 1}'
+
+
+def replay_user():
+    """Пользователь с наибольшим числом подписок, иначе любой."""
+    user_id = Follow.objects.values('user').annotate(
+        total=models.Count('pk')
+    ).order_by('-total').values_list('user', flat=True).first()
+    if user_id is None:
+        user_id = User.objects.aggregate(pk=Max('pk'))['pk']
+    return User.objects.filter(pk=user_id).first()
+
+
+def problems(plan):
+    """Проблемы в строках EXPLAIN QUERY PLAN: список (вид, таблица)."""
+    found = []
+    for detail in plan:
+        match = SCAN_RE.match(detail)
+        if match:
+            found.append((FULL_SCAN, match.group(1)))
+        elif 'TEMP B-TREE' in detail:
+            found.append((TEMP_SORT, None))
+    return found
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+
+def replay(urls, user=None):
+    """Запрашивает страницы и возвращает Finding для проблемных SELECT.
+
+    Все записи, сделанные представлениями, откатываются.
+    """
+    findings = []
+    client = Client()
+    with override_settings(**REPLAY_SETTINGS), transaction.atomic():
+        if user is not None:
+            client.force_login(user)
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                client.get(url)
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                plan = explain(sql)
+                found = problems(plan)
+                if found:
+                    findings.append(Finding(url, sql, plan, found))
+        transaction.set_rollback(True)
+    return findings
+
+
+def _models_by_table():
+    return {
+        model._meta.db_table: model
+        for model in apps.get_app_config(APP_LABEL).get_models()
+    }
+
+
+def suggest(sql, plan_problems):
+    """Кандидат в индексы для запроса или None."""
+    scanned = [table for kind, table in plan_problems if kind == FULL_SCAN]
+    table = scanned[0] if scanned else _order_table(sql)
+    model = _models_by_table().get(table)
+    if model is None:
+        return None
+    columns = {field.column: field.name for field in model._meta.fields}
+    fields = []
+    for match_table, column in EQUALS_RE.findall(_split(sql)[0]):
+        name = columns.get(column)
+        if match_table == table and name and name not in fields:
+            fields.append(name)
+    for match_table, column, direction in _order_terms(sql):
+        name = columns.get(column)
+        if match_table != table or name is None:
+            # Сортировка по другой таблице индексом не покрывается.
+            break
+        if name not in fields:
+            fields.append(f'-{name}' if direction == 'DESC' else name)
+    if not fields or _covered(table, fields):
+        return None
+    return Suggestion(model, tuple(fields))
+
+
+def _split(sql):
+    where = sql.split(' WHERE ', 1)[1] if ' WHERE ' in sql else ''
+    where, _, order = where.partition(' ORDER BY ')
+    if not order and ' ORDER BY ' in sql:
+        order = sql.split(' ORDER BY ', 1)[1]
+    order = order.split(' LIMIT ', 1)[0]
+    return where, order
+
+
+def _order_terms(sql):
+    """(таблица, столбец, направление) из ORDER BY с учётом псевдонимов."""
+    aliases = {
+        alias: (table, column)
+        for table, column, alias in ALIAS_RE.findall(sql)
+    }
+    terms = []
+    for table, column, direction in ORDER_RE.findall(_split(sql)[1]):
+        if not table:
+            table, column = aliases.get(column, (None, column))
+        terms.append((table, column, direction))
+    return terms
+
+
+def _order_table(sql):
+    terms = _order_terms(sql)
+    return terms[0][0] if terms else None
+
+
+def _covered(table, fields):
+    """Есть ли в базе индекс, начинающийся с этих столбцов."""
+    model = _models_by_table()[table]
+    wanted = [
+        model._meta.get_field(name.lstrip('-')).column for name in fields
+    ]
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, table
+        )
+    return any(
+        (info['index'] or info['unique'] or info['primary_key'])
+        and info['columns'][:len(wanted)] == wanted
+        for info in constraints.values()
+    )
+
+
+def index_name(suggestion):
+    """Имя индекса в стиле проекта: <модель>_<поля>_idx, до 30 символов."""
+    parts = [suggestion.model._meta.model_name]
+    parts += [name.lstrip('-') for name in suggestion.fields]
+    return '_'.join(parts)[:26].rstrip('_') + '_idx'
+
+
+def as_operations(suggestions):
+    return [
+        AddIndex(
+            model_name=suggestion.model._meta.model_name,
+            index=models.Index(
+                fields=list(suggestion.fields), name=index_name(suggestion)
+            ),
+        )
+        for suggestion in suggestions
+    ]
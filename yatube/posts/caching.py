@@ -0,0 +1,109 @@
+"""Поколения для кэша страниц с постами.
+
+У каждой области (вся лента, группа, автор) есть счётчик поколения.
+Сигналы на изменение постов, комментариев и групп увеличивают его,
+а ключ фрагмента страницы включает текущие поколения своих областей.
+После изменения старые фрагменты просто перестают запрашиваться,
+поэтому кэш можно держать долго и не показывать устаревшее.
+
+Здесь же кэш объектов для поиска группы по slug и пользователя
+по username: эти строки почти не меняются, а читаются на каждой
+странице группы и профиля.
+"""
+import time
+
+from django.core.cache import cache
+from django.http import Http404
+
+from core.cache.local import TwoTierCache
+
+from . import counts
+from .models import Group, User
+
+# Мягкий TTL фрагментов; жёсткий см. core.cache.swr.HARD_TTL_FACTOR.
+FEED_CACHE_TIMEOUT = 10 * 60
+# Поля пользователя, которые выводят закэшированные фрагменты лент;
+# только они лежат в кэше объектов, хэш пароля и email — нет.
+USER_DISPLAY_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def generation_key(scope, pk=None):
+    if pk is None:
+        return f'posts:gen:{scope}'
+    return f'posts:gen:{scope}:{pk}'
+
+
+def post_generation_keys(post, group_ids=()):
+    """Поколения областей, в которых показывается пост."""
+    keys = [
+        generation_key(counts.ALL),
+        generation_key(counts.AUTHOR, post.author_id),
+    ]
+    for group_id in {post.group_id, *group_ids}:
+        if group_id:
+            keys.append(generation_key(counts.GROUP, group_id))
+    return keys
+
+
+def _fresh_generation():
+    # Значение, которого не было до вытеснения ключа из кэша.
+    return int(time.time() * 1000)
+
+
+def get_generations(keys):
+    """Текущие поколения для ключей, отсутствующие заводятся заново."""
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _fresh_generation(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _fresh_generation(), None)
+
+
+def page_cache_key(page_obj, *keys):
+    """Ключ фрагмента страницы: поколения областей и позиция страницы."""
+    keys = list(keys)
+    generations = '.'.join(str(gen) for gen in get_generations(keys))
+    if getattr(page_obj, 'is_cursor', False):
+        position = repr(page_obj)
+    else:
+        position = page_obj.number
+    return f'{",".join(keys)}:{generations}:{position}'
+
+
+groups_by_slug = TwoTierCache('posts:group')
+users_by_username = TwoTierCache('posts:user')
+
+
+def get_group_by_slug(slug):
+    """Группа по slug из кэша объектов или Http404."""
+    group = groups_by_slug.get_or_load(
+        slug, lambda: Group.objects.filter(slug=slug).first()
+    )
+    if group is None:
+        raise Http404('Группа не найдена')
+    return group
+
+
+def get_user_by_username(username):
+    """Пользователь по username из кэша объектов или Http404.
+
+    Загружены только pk и USER_DISPLAY_FIELDS.
+    """
+    user = users_by_username.get_or_load(
+        username,
+        lambda: User.objects.filter(
+            username=username
+        ).only(*USER_DISPLAY_FIELDS).first(),
+    )
+    if user is None:
+        raise Http404('Пользователь не найден')
+    return user
@@ -0,0 +1,85 @@
+"""Счётчики постов по областям без COUNT(*) на каждый запрос.
+
+Область задаётся ключом: все посты, посты группы, посты автора или
+лента подписчика. Режим выбирается настройкой POSTS_COUNT_MODE:
+
+* ``exact`` — всегда SELECT COUNT(*);
+* ``cached`` — значение хранится в кэше и сдвигается сигналами
+  при создании и удалении постов, COUNT(*) выполняется только
+  при промахе;
+* ``estimated`` — для всей таблицы берётся оценка из статистики
+  планировщика (sqlite_stat1 / pg_class), остальное как в ``cached``.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+
+from core.db import routers
+
+EXACT = 'exact'
+CACHED = 'cached'
+ESTIMATED = 'estimated'
+
+ALL = 'all'
+GROUP = 'group'
+AUTHOR = 'author'
+FEED = 'feed'
+
+COUNT_TIMEOUT = 60 * 60
+
+
+def scope_key(scope, pk=None):
+    if pk is None:
+        return f'posts:count:{scope}'
+    return f'posts:count:{scope}:{pk}'
+
+
+def get_count(queryset, key, mode=None):
+    """Количество строк queryset для области key."""
+    mode = mode or getattr(settings, 'POSTS_COUNT_MODE', CACHED)
+    if mode == EXACT:
+        return queryset.count()
+    if mode == ESTIMATED and key == scope_key(ALL):
+        estimate = estimate_rows(queryset.model._meta.db_table)
+        if estimate is not None:
+            return estimate
+    value = cache.get(key)
+    if value is None:
+        # Значение общее для всех, реплика могла отстать.
+        with routers.primary():
+            value = queryset.count()
+        cache.add(key, value, COUNT_TIMEOUT)
+    return value
+
+
+def adjust(keys, delta):
+    """Сдвигает закэшированные счётчики; отсутствующие не создаёт."""
+    for key in keys:
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            pass
+
+
+def invalidate(keys):
+    cache.delete_many(list(keys))
+
+
+def estimate_rows(table):
+    """Оценка числа строк по статистике планировщика или None."""
+    if connection.vendor == 'sqlite':
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None:
+        return None
+    value = str(row[0]).split()[0]
+    return max(int(float(value)), 0)
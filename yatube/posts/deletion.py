@@ -0,0 +1,115 @@
+"""Удаление пользователей и групп с большими каскадами по частям.
+
+Обычный delete() сначала собирает в память все зависимые строки
+и удаляет их одной долгой транзакцией. Здесь объект помечается
+строкой PendingDeletion, а зависимые строки удаляются (или у постов
+группы обнуляется group) порциями по chunk_size, каждая в своей
+короткой транзакции. Прерванную обработку можно запустить снова:
+каждый шаг берёт только то, что ещё осталось.
+"""
+import time
+
+from django.db import transaction
+
+from . import caching, counts
+from .models import (
+    Comment, FeedEntry, Follow, Group, PendingDeletion, Post, User
+)
+
+CHUNK_SIZE = 500
+
+
+def schedule(obj):
+    """Ставит пользователя или группу в очередь на удаление.
+
+    Пользователь сразу деактивируется и больше не может войти.
+    """
+    if isinstance(obj, Group):
+        kind = PendingDeletion.GROUP
+    else:
+        kind = PendingDeletion.USER
+        User.objects.filter(pk=obj.pk).update(is_active=False)
+    pending, _ = PendingDeletion.objects.get_or_create(
+        kind=kind, object_id=obj.pk
+    )
+    return pending
+
+
+def _delete(queryset):
+    return queryset.delete()[0]
+
+
+def _ungroup(queryset):
+    authors = set(queryset.values_list('author_id', flat=True))
+    updated = queryset.update(group=None)
+    caching.bump(
+        [caching.generation_key(counts.ALL)]
+        + [caching.generation_key(counts.AUTHOR, pk) for pk in authors]
+    )
+    return updated
+
+
+def user_steps(user_id):
+    """Шаги удаления пользователя: (название, queryset, действие).
+
+    Сначала записи лент с постами автора и подписки, чтобы удаление
+    постов не раскладывало изменения по подписчикам; затем
+    комментарии и посты, которые иначе ушли бы в один каскад.
+    """
+    return (
+        ('feed', FeedEntry.objects.filter(post__author_id=user_id), _delete),
+        ('followers', Follow.objects.filter(author_id=user_id), _delete),
+        ('following', Follow.objects.filter(user_id=user_id), _delete),
+        ('own feed', FeedEntry.objects.filter(user_id=user_id), _delete),
+        (
+            'comments on posts',
+            Comment.objects.filter(post__author_id=user_id),
+            _delete,
+        ),
+        ('comments', Comment.objects.filter(author_id=user_id), _delete),
+        ('posts', Post.objects.filter(author_id=user_id), _delete),
+    )
+
+
+def group_steps(group_id):
+    return (
+        ('posts', Post.objects.filter(group_id=group_id), _ungroup),
+    )
+
+
+STEPS = {
+    PendingDeletion.USER: (User, user_steps),
+    PendingDeletion.GROUP: (Group, group_steps),
+}
+
+
+def process(pending, chunk_size=CHUNK_SIZE, pause=0, progress=None):
+    """Выполняет удаление из pending по частям.
+
+    progress(pending, step, count) вызывается после каждой порции.
+    Возвращает число обработанных строк.
+    """
+    model, steps = STEPS[pending.kind]
+    processed = 0
+    for step, queryset, action in steps(pending.object_id):
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    queryset.order_by().values_list('pk', flat=True)
+                    [:chunk_size]
+                )
+                if not ids:
+                    break
+                count = action(queryset.model.objects.filter(pk__in=ids))
+                processed += count
+                pending.removed += count
+                pending.save(update_fields=['removed'])
+            if progress is not None:
+                progress(pending, step, count)
+            if pause:
+                # Даём другим писателям забрать блокировку.
+                time.sleep(pause)
+    with transaction.atomic():
+        processed += _delete(model.objects.filter(pk=pending.object_id))
+        pending.delete()
+    return processed
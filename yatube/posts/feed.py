@@ -0,0 +1,90 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Каждый пост автора копируется в ленту подписчиков в виде FeedEntry,
+поэтому страница подписок читается одним диапазоном индекса
+(user, -pub_date) вместо соединения Follow и Post.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from . import counts
+from .models import FeedEntry, Follow, Post
+
+BATCH_SIZE = 500
+
+
+def _insert(entries):
+    FeedEntry.objects.bulk_create(
+        entries,
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Возвращает id подписчиков, получивших пост.
+    """
+    followers = list(Follow.objects.filter(
+        author_id=post.author_id,
+    ).values_list('user_id', flat=True).distinct())
+    _insert(
+        FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers
+    )
+    return followers
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id,
+    ).values_list('id', 'pub_date')
+    _insert(
+        FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты подписчика посты автора."""
+    FeedEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id,
+    ).delete()
+
+
+def feed_posts(user):
+    """Посты ленты подписок пользователя, от новых к старым."""
+    # F, а не строка: иначе к post добавилась бы сортировка Post.Meta,
+    # и индекс (user, -pub_date, -post) перестал бы подходить.
+    return Post.objects.select_related('author', 'group').filter(
+        feed_entries__user=user,
+    ).order_by('-feed_entries__pub_date', F('feed_entries__post').desc())
+
+
+def rebuild(user_ids=None):
+    """Пересобирает ленты из Follow и Post.
+
+    Лента каждого подписчика пересобирается в своей короткой
+    транзакции: блокировка записи не держится всю пересборку.
+    Возвращает количество обработанных подписок.
+    """
+    if user_ids is None:
+        user_ids = {
+            *FeedEntry.objects.order_by().values_list('user_id', flat=True),
+            *Follow.objects.order_by().values_list('user_id', flat=True),
+        }
+    processed = 0
+    for user_id in sorted(set(user_ids)):
+        authors = Follow.objects.filter(
+            user_id=user_id,
+        ).order_by().values_list('author_id', flat=True).distinct()
+        with transaction.atomic():
+            FeedEntry.objects.filter(user_id=user_id).delete()
+            for author_id in authors:
+                backfill(user_id, author_id)
+                processed += 1
+        counts.invalidate([counts.scope_key(counts.FEED, user_id)])
+    return processed
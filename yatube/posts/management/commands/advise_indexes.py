@@ -0,0 +1,73 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, migrations
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+
+from posts import advisor
+
+
+class Command(BaseCommand):
+    help = (
+        'Запрашивает страницы posts на текущей базе, ищет в планах '
+        'запросов полные просмотры и временные сортировки и предлагает '
+        'индексы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Завершиться с ошибкой, если есть предложения.',
+        )
+        parser.add_argument(
+            '--write-migration',
+            action='store_true',
+            help='Записать предложенные индексы в новую миграцию posts.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Поддерживается только SQLite.')
+        findings = advisor.replay(
+            advisor.sample_urls(), advisor.replay_user()
+        )
+        suggestions = []
+        for finding in findings:
+            self.stdout.write(self.style.WARNING(finding.url))
+            self.stdout.write(f'  {finding.sql}')
+            for detail in finding.plan:
+                self.stdout.write(f'    {detail}')
+            suggestion = advisor.suggest(finding.sql, finding.problems)
+            if suggestion is not None and suggestion not in suggestions:
+                suggestions.append(suggestion)
+        if not suggestions:
+            self.stdout.write(self.style.SUCCESS('Новые индексы не нужны'))
+            return
+        self.stdout.write('Предлагаемые индексы:')
+        for suggestion in suggestions:
+            self.stdout.write(
+                f'  {suggestion.model.__name__}: '
+                f'models.Index(fields={list(suggestion.fields)!r}, '
+                f'name={advisor.index_name(suggestion)!r})'
+            )
+        if options['write_migration']:
+            self.stdout.write(f'Миграция: {self.write_migration(suggestions)}')
+        if options['check']:
+            raise CommandError(f'Не хватает индексов: {len(suggestions)}')
+
+    def write_migration(self, suggestions):
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        leaf, = loader.graph.leaf_nodes(advisor.APP_LABEL)
+        number = int(leaf[1].split('_', 1)[0]) + 1
+        migration = migrations.Migration(
+            f'{number:04d}_advised_indexes', advisor.APP_LABEL
+        )
+        migration.dependencies = [leaf]
+        migration.operations = advisor.as_operations(suggestions)
+        writer = MigrationWriter(migration)
+        os.makedirs(os.path.dirname(writer.path), exist_ok=True)
+        with open(writer.path, 'w', encoding='utf-8') as migration_file:
+            migration_file.write(writer.as_string())
+        return writer.path
@@ -0,0 +1,60 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from core.processes import fork_pool
+from posts import images
+from posts.models import Post
+
+BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры, объём, хэш и заглушку картинок постов, '
+        'загруженных до появления этих полей. Файлы читаются параллельно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Число процессов; 0 — считать в текущем процессе.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько постов сохранять одним запросом.',
+        )
+        parser.add_argument(
+            '--all', action='store_true', dest='recompute',
+            help='Пересчитать и уже заполненные картинки.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only('id', 'image')
+        if not options['recompute']:
+            posts = posts.filter(image_hash='')
+        posts = posts.order_by('pk')
+        workers = options['workers']
+        executor = fork_pool(workers) if workers else None
+        last = total = 0
+        try:
+            while True:
+                batch = list(posts.filter(pk__gt=last)[:options['batch_size']])
+                if not batch:
+                    break
+                names = [post.image.name for post in batch]
+                if executor is None:
+                    results = map(images.read, names)
+                else:
+                    results = executor.map(images.read, names)
+                for post, values in zip(batch, results):
+                    for field, value in values.items():
+                        setattr(post, field, value)
+                Post.objects.bulk_update(batch, images.FIELDS)
+                last = batch[-1].pk
+                total += len(batch)
+                self.stdout.write(f'Обработано картинок: {total}')
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        self.stdout.write(self.style.SUCCESS('Сведения о картинках заполнены'))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import deletion
+from posts.models import Group, PendingDeletion, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет пользователей и группы из очереди PendingDeletion '
+        'по частям в коротких транзакциях.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', action='append', default=[], dest='usernames',
+            help='Поставить пользователя в очередь; можно несколько раз.',
+        )
+        parser.add_argument(
+            '--group', action='append', default=[], dest='slugs',
+            help='Поставить группу в очередь; можно несколько раз.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=deletion.CHUNK_SIZE,
+            help='Сколько строк обрабатывать в одной транзакции.',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Пауза между порциями в секундах.',
+        )
+
+    def handle(self, *args, **options):
+        for model, field, values in (
+            (User, 'username', options['usernames']),
+            (Group, 'slug', options['slugs']),
+        ):
+            for value in values:
+                obj = model.objects.filter(**{field: value}).first()
+                if obj is None:
+                    raise CommandError(f'Не найден {field}={value}')
+                deletion.schedule(obj)
+        for pending in PendingDeletion.objects.all():
+            total = deletion.process(
+                pending,
+                options['chunk_size'],
+                options['pause'],
+                progress=self.progress,
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'{pending.kind} {pending.object_id}: удалён, '
+                f'обработано строк {total}'
+            ))
+
+    def progress(self, pending, step, count):
+        self.stdout.write(
+            f'{pending.kind} {pending.object_id}: {step} +{count} '
+            f'(всего {pending.removed})'
+        )
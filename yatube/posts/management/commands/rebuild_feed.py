@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок (FeedEntry) из Follow и Post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            type=int,
+            dest='user_ids',
+            help='id подписчика; можно указать несколько раз.',
+        )
+
+    def handle(self, *args, **options):
+        processed = feed.rebuild(options['user_ids'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересобрано подписок: {processed}')
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с данными по кускам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=stats.CHUNK_SIZE,
+            help='Сколько строк сверять в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        report = stats.reconcile(options['chunk_size'])
+        for table, fixed in report.items():
+            self.stdout.write(f'{table}: исправлено {fixed}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены'))
@@ -0,0 +1,52 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+from django.db.models.functions import Greatest
+
+
+def remove_duplicates(apps, schema_editor):
+    """Оставляет по одной подписке на пару (user, author).
+
+    Лишние строки удаляются без сигналов, поэтому счётчики UserStats
+    сдвигаются здесь же.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    duplicates = (
+        Follow.objects.order_by().values('user', 'author')
+        .annotate(keep=Min('pk'), total=Count('pk'))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        extra = row['total'] - 1
+        Follow.objects.filter(
+            user=row['user'], author=row['author']
+        ).exclude(pk=row['keep']).delete()
+        UserStats.objects.filter(user_id=row['user']).update(
+            following_count=Greatest(F('following_count') - extra, 0)
+        )
+        UserStats.objects.filter(user_id=row['author']).update(
+            followers_count=Greatest(F('followers_count') - extra, 0)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0006_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='follow_author_user_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_timeline_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingDeletion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'Пользователь'), ('group', 'Группа')], max_length=10, verbose_name='Что удаляется')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id объекта')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Запрошено')),
+                ('removed', models.PositiveIntegerField(default=0, editable=False, verbose_name='Обработано строк')),
+            ],
+            options={
+                'verbose_name': 'Отложенное удаление',
+                'verbose_name_plural': 'Отложенные удаления',
+                'ordering': ['created'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pendingdeletion',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_pending_deletion'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:24
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+BATCH_SIZE = 500
+
+
+def fill_excerpts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.only('id', 'text').order_by('pk')
+    last = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last)[:BATCH_SIZE])
+        if not batch:
+            return
+        for post in batch:
+            post.excerpt = Truncator(post.text.strip()).chars(300)
+        Post.objects.bulk_update(batch, ['excerpt'])
+        last = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_pendingdeletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300, verbose_name='Анонс'),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
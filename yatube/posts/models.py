@@ -1,8 +1,17 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils.text import Truncator
+
+from . import images
 
 User = get_user_model()
 
+EXCERPT_LENGTH = 300
+
+
+def make_excerpt(text):
+    return Truncator(text.strip()).chars(EXCERPT_LENGTH)
+
 
 class Group(models.Model):
     title = models.CharField(
@@ -16,6 +25,11 @@ class Group(models.Model):
     description = models.TextField(
         'Описание группы'
     )
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False,
+    )
 
     def __str__(self):
         return f'{self.title}'
@@ -52,15 +66,76 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False,
+    )
+    # Начало текста для списков: там text не загружается (defer).
+    excerpt = models.CharField(
+        'Анонс',
+        max_length=EXCERPT_LENGTH,
+        blank=True,
+        editable=False,
+    )
+    # Сведения о картинке считаются при загрузке (posts.images).
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False,
+    )
+    image_size = models.PositiveIntegerField(
+        'Размер картинки в байтах', null=True, blank=True, editable=False,
+    )
+    image_hash = models.CharField(
+        'SHA-256 картинки', max_length=64, blank=True, editable=False,
+    )
+    image_placeholder = models.TextField(
+        'Заглушка картинки', blank=True, editable=False,
+    )
 
     class Meta:
-        ordering = ['-pub_date']
+        # id разрешает равные даты так же, как курсорная пагинация.
+        ordering = ['-pub_date', '-id']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            # Ленты группы и автора читаются по индексу без сортировки.
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.text[:15]}'
 
+    def save(self, *args, **kwargs):
+        self.excerpt = make_excerpt(self.text)
+        if not self.image:
+            values = images.EMPTY
+        elif not self.image._committed:
+            # Новый файл ещё в памяти: хранилище не читается.
+            values = images.metadata(self.image)
+        else:
+            values = {}
+        for field, value in values.items():
+            setattr(self, field, value)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            extra = set()
+            if 'text' in update_fields:
+                extra.add('excerpt')
+            if 'image' in update_fields:
+                extra.update(images.FIELDS)
+            kwargs['update_fields'] = {*update_fields, *extra}
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -76,6 +151,15 @@ class Comment(models.Model):
     text = models.TextField(verbose_name='Текст комментария')
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        ordering = ['created', 'id']
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.text
 
@@ -92,3 +176,110 @@ class Follow(models.Model):
         related_name='following',
         on_delete=models.CASCADE,
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow',
+            ),
+        ]
+        indexes = [
+            # Обратное направление: подписчики автора без обращения
+            # к таблице (fan-out ленты, счётчики).
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, поддерживаемые при записи."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'{self.user_id}'
+
+
+class FeedEntry(models.Model):
+    """Материализованная лента подписок: пост автора у подписчика."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class PendingDeletion(models.Model):
+    """Пользователь или группа, которые удаляются по частям в фоне."""
+    USER = 'user'
+    GROUP = 'group'
+    KINDS = (
+        (USER, 'Пользователь'),
+        (GROUP, 'Группа'),
+    )
+
+    kind = models.CharField('Что удаляется', max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField('id объекта')
+    created = models.DateTimeField('Запрошено', auto_now_add=True)
+    removed = models.PositiveIntegerField(
+        'Обработано строк',
+        default=0,
+        editable=False,
+    )
+
+    class Meta:
+        ordering = ['created']
+        verbose_name = 'Отложенное удаление'
+        verbose_name_plural = 'Отложенные удаления'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'],
+                name='unique_pending_deletion',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
@@ -0,0 +1,177 @@
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from . import counts
+
+
+def encode_cursor(date, pk):
+    """Упаковывает позицию (дата, id) в непрозрачный токен для URL."""
+    raw = f'{date.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен; для испорченного токена возвращает None."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        date, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if date is None:
+        return None
+    return date, pk
+
+
+class CountedPaginator(Paginator):
+    """Paginator, берущий общее количество из счётчика области.
+
+    С cursor_field строки страницы получают cursor_date, и ссылки
+    «Следующая»/«Предыдущая» переводят в курсорный режим
+    (CursorPaginator) от крайних строк страницы.
+    """
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, count_key=None,
+                 cursor_field=None):
+        # COUNT по аннотированному queryset превращается в подзапрос
+        # с GROUP BY, поэтому считается исходный.
+        self.count_list = object_list
+        if cursor_field is not None:
+            object_list = object_list.annotate(cursor_date=F(cursor_field))
+        super().__init__(object_list, per_page)
+        self.count_key = count_key
+        self.cursor_field = cursor_field
+
+    def cursor_for(self, obj):
+        if self.cursor_field is None:
+            return None
+        return encode_cursor(obj.cursor_date, obj.pk)
+
+    @cached_property
+    def count(self):
+        if self.count_key is not None:
+            return counts.get_count(self.count_list, self.count_key)
+        if self.cursor_field is not None:
+            return self.count_list.count()
+        return super().count
+
+    def get_elided_page_range(self, number=1, on_each_side=3, on_ends=2):
+        """Номера страниц вокруг текущей и по краям, пропуски — ELLIPSIS.
+
+        Длина диапазона не зависит от общего числа страниц.
+        """
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > on_each_side + on_ends + 2:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинации: без номера и без подсчёта строк."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        if not self.object_list:
+            return '<Cursor page (empty)>'
+        first = self.paginator.cursor_for(self.object_list[0])
+        last = self.paginator.cursor_for(self.object_list[-1])
+        return f'<Cursor page {first}..{last}>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return self.paginator.cursor_for(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return self.paginator.cursor_for(self.object_list[0])
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (date_field, id).
+
+    Страница выбирается условием по индексу вместо OFFSET, поэтому её
+    стоимость не зависит от глубины, а COUNT(*) не выполняется.
+    По умолчанию записи идут от новых к старым (descending=True).
+    """
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 descending=True):
+        super().__init__(object_list, per_page)
+        self.date_field = date_field
+        self.descending = descending
+
+    def cursor_for(self, obj):
+        return encode_cursor(obj.cursor_date, obj.pk)
+
+    def _ordering(self, forward):
+        if forward == self.descending:
+            return '-cursor_date', '-pk'
+        return 'cursor_date', 'pk'
+
+    def _beyond(self, date, pk, forward):
+        lookup = 'lt' if forward == self.descending else 'gt'
+        return (
+            Q(**{f'cursor_date__{lookup}': date})
+            | Q(cursor_date=date, **{f'pk__{lookup}': pk})
+        )
+
+    def get_page(self, after=None, before=None):
+        """Возвращает страницу после/перед токеном или первую страницу."""
+        queryset = self.object_list.annotate(cursor_date=F(self.date_field))
+        position = decode_cursor(after or before or '')
+        if position is None:
+            rows = list(
+                queryset.order_by(*self._ordering(True))[:self.per_page + 1]
+            )
+            return self._page(rows, has_previous=False)
+        date, pk = position
+        forward = bool(after)
+        rows = list(
+            queryset.filter(
+                self._beyond(date, pk, forward)
+            ).order_by(*self._ordering(forward))[:self.per_page + 1]
+        )
+        if forward:
+            return self._page(rows, has_previous=True)
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return CursorPage(rows, self, True, has_previous)
+
+    def _page(self, rows, has_previous):
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page], self, has_next, has_previous)
@@ -0,0 +1,189 @@
+"""Картинки постов нужного размера по подписанной ссылке.
+
+Ссылку строит url(): ширина, высота, вписывание (fit) и формат входят
+в путь и подписываются HMAC с SECRET_KEY, поэтому перебирать размеры
+и нагружать сервер ресайзом чужие клиенты не могут. Готовые файлы
+лежат в каталоге RESIZE_CACHE_DIR; при превышении RESIZE_CACHE_MAX_BYTES
+удаляются давно не запрошенные (LRU по mtime, который обновляется
+при каждом попадании). Имя загруженного файла не переиспользуется,
+поэтому результат для одной ссылки не меняется, и его можно отдавать
+с сильным ETag и Cache-Control: immutable.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from PIL import Image, ImageOps
+
+from .thumbnails import FORMATS
+
+SALT = 'posts.resize'
+MAX_SIDE = 2000
+FITS = ('cover', 'contain')
+# Расширение в ссылке: (формат Pillow, Content-Type, качество);
+# WebP и AVIF — только если их умеет сохранять Pillow.
+EXTENSIONS = {
+    extension: spec
+    for extension, spec in {
+        'jpg': ('JPEG', 'image/jpeg', 80),
+        'png': ('PNG', 'image/png', None),
+        'webp': ('WEBP', 'image/webp', 75),
+        'avif': ('AVIF', 'image/avif', 55),
+    }.items()
+    if spec[0] in ('JPEG', 'PNG') + FORMATS
+}
+SPEC_RE = re.compile(
+    r'^(?P<width>\d{1,4})x(?P<height>\d{1,4})-(?P<fit>[a-z]+)'
+    r'\.(?P<extension>[a-z]+)$'
+)
+# Ключ общего кэша с примерным объёмом каталога.
+SIZE_KEY = 'resize:bytes'
+# После очистки каталог занимает не больше этой доли лимита.
+EVICT_TO = 0.9
+
+
+class InvalidSpec(ValueError):
+    pass
+
+
+def _cache_dir():
+    return settings.RESIZE_CACHE_DIR
+
+
+def _max_bytes():
+    return settings.RESIZE_CACHE_MAX_BYTES
+
+
+def _spec(width, height, fit, extension):
+    return f'{width}x{height}-{fit}.{extension}'
+
+
+def signature(spec, name):
+    return signing.Signer(salt=SALT).signature(f'{spec}/{name}')
+
+
+def url(name, width, height, fit='cover', extension='jpg'):
+    """Подписанная ссылка на картинку name размера width x height."""
+    spec = _spec(width, height, fit, extension)
+    parse(spec)
+    return reverse(
+        'posts:resized_image', args=[signature(spec, name), spec, name]
+    )
+
+
+def parse(spec):
+    """(ширина, высота, fit, расширение) из spec или InvalidSpec."""
+    match = SPEC_RE.match(spec)
+    if match is None:
+        raise InvalidSpec(spec)
+    width, height = int(match['width']), int(match['height'])
+    if not (0 < width <= MAX_SIDE and 0 < height <= MAX_SIDE):
+        raise InvalidSpec(spec)
+    if match['fit'] not in FITS or match['extension'] not in EXTENSIONS:
+        raise InvalidSpec(spec)
+    return width, height, match['fit'], match['extension']
+
+
+def verify(token, spec, name):
+    return constant_time_compare(token, signature(spec, name))
+
+
+def etag(spec, name):
+    return hashlib.sha256(f'{spec}/{name}'.encode()).hexdigest()
+
+
+def cache_path(key, extension):
+    return os.path.join(_cache_dir(), key[:2], f'{key}.{extension}')
+
+
+def render(name, width, height, fit, extension):
+    """Байты картинки из хранилища в нужном размере и формате."""
+    image_format, _, quality = EXTENSIONS[extension]
+    with default_storage.open(name) as file, Image.open(file) as image:
+        image.draft('RGB', (width, height))
+        image = ImageOps.exif_transpose(image)
+        if image_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        if fit == 'cover':
+            image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        else:
+            image.thumbnail((width, height), Image.LANCZOS)
+        options = {'optimize': True}
+        if quality is not None:
+            options['quality'] = quality
+        content = BytesIO()
+        image.save(content, image_format, **options)
+    return content.getvalue()
+
+
+def get(spec, name):
+    """Байты готовой картинки; при промахе она создаётся.
+
+    Картинки небольшие и читаются целиком: файл, удалённый при
+    вытеснении другим запросом, всё равно будет отдан.
+    """
+    width, height, fit, extension = parse(spec)
+    path = cache_path(etag(spec, name), extension)
+    try:
+        with open(path, 'rb') as file:
+            # Отметка для LRU: файл запрошен сейчас.
+            os.utime(file.fileno())
+            return file.read()
+    except FileNotFoundError:
+        pass
+    data = render(name, width, height, fit, extension)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Параллельные запросы пишут каждый в свой файл, os.replace атомарен.
+    descriptor, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(path), suffix='.part'
+    )
+    with os.fdopen(descriptor, 'wb') as file:
+        file.write(data)
+    os.replace(temporary, path)
+    _account(len(data))
+    return data
+
+
+def _account(size):
+    try:
+        total = cache.incr(SIZE_KEY, size)
+    except ValueError:
+        total = None
+    if total is None or total > _max_bytes():
+        evict()
+
+
+def evict():
+    """Удаляет давно не запрошенные файлы, пока каталог больше лимита."""
+    files = []
+    for root, _, names in os.walk(_cache_dir()):
+        for file_name in names:
+            path = os.path.join(root, file_name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    if total > _max_bytes():
+        limit = _max_bytes() * EVICT_TO
+        for _, size, path in sorted(files):
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+    cache.set(SIZE_KEY, total, None)
+    return removed
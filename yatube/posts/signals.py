@@ -0,0 +1,189 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import caching, counts, feed, stats, thumbnails
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def post_count_keys(post):
+    keys = [
+        counts.scope_key(counts.ALL),
+        counts.scope_key(counts.AUTHOR, post.author_id),
+    ]
+    if post.group_id:
+        keys.append(counts.scope_key(counts.GROUP, post.group_id))
+    return keys
+
+
+@receiver(pre_save, sender=Post)
+def post_group_change(sender, instance, **kwargs):
+    instance._old_group_id = None
+    instance._group_changed = False
+    if instance._state.adding or instance.pk is None:
+        return
+    old_group_id = Post.objects.filter(
+        pk=instance.pk
+    ).values_list('group_id', flat=True).first()
+    if old_group_id != instance.group_id:
+        instance._old_group_id = old_group_id
+        instance._group_changed = True
+        counts.invalidate(
+            counts.scope_key(counts.GROUP, group_id)
+            for group_id in (old_group_id, instance.group_id) if group_id
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    old_group_id = getattr(instance, '_old_group_id', None)
+    caching.bump(caching.post_generation_keys(instance, [old_group_id]))
+    if getattr(instance, '_group_changed', False):
+        stats.change_group(old_group_id, -1)
+        stats.change_group(instance.group_id, 1)
+    if not created:
+        return
+    stats.change_user(instance.author_id, posts_count=1)
+    stats.change_group(instance.group_id, 1)
+    followers = feed.fan_out(instance)
+    counts.adjust(post_count_keys(instance), 1)
+    # Счётчики лент сбрасываются одной транзакцией кэша, а не incr
+    # на каждого подписчика.
+    counts.invalidate(counts.scope_key(counts.FEED, pk) for pk in followers)
+
+
+@receiver(post_save, sender=Post)
+def post_image_saved(sender, instance, **kwargs):
+    if instance.image:
+        transaction.on_commit(
+            partial(thumbnails.pregenerate, instance.image.name)
+        )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    caching.bump(caching.post_generation_keys(instance))
+    stats.change_user(instance.author_id, posts_count=-1)
+    stats.change_group(instance.group_id, -1)
+    followers = Follow.objects.filter(
+        author_id=instance.author_id
+    ).values_list('user_id', flat=True).distinct()
+    counts.adjust(post_count_keys(instance), -1)
+    counts.invalidate(counts.scope_key(counts.FEED, pk) for pk in followers)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, created=False, **kwargs):
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is None:
+        return
+    caching.bump(caching.post_generation_keys(post))
+    if created:
+        stats.change_post(post.pk, 1)
+    elif kwargs['signal'] is post_delete:
+        stats.change_post(post.pk, -1)
+
+
+def remember_old_value(instance, field):
+    # Старое значение ключевого поля, чтобы сбросить кэш и по нему.
+    if instance._state.adding or instance.pk is None:
+        return None
+    return type(instance).objects.filter(
+        pk=instance.pk
+    ).values_list(field, flat=True).first()
+
+
+@receiver(pre_save, sender=Group)
+def group_slug_change(sender, instance, **kwargs):
+    instance._old_slug = remember_old_value(instance, 'slug')
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    caching.bump([
+        caching.generation_key(counts.ALL),
+        caching.generation_key(counts.GROUP, instance.pk),
+    ])
+    caching.groups_by_slug.delete(
+        instance.slug, getattr(instance, '_old_slug', None)
+    )
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    caching.bump([
+        caching.generation_key(counts.ALL),
+        caching.generation_key(counts.GROUP, instance.pk),
+    ])
+    counts.invalidate([counts.scope_key(counts.GROUP, instance.pk)])
+    caching.groups_by_slug.delete(instance.slug)
+
+
+@receiver(pre_save, sender=User)
+def user_username_change(sender, instance, update_fields=None, **kwargs):
+    instance._old_username = None
+    instance._display_changed = False
+    fields = [
+        field for field in caching.USER_DISPLAY_FIELDS
+        if update_fields is None or field in update_fields
+    ]
+    if not fields or instance._state.adding or instance.pk is None:
+        return
+    old = User.objects.filter(pk=instance.pk).values(*fields).first()
+    if old is None:
+        return
+    instance._old_username = old.get('username')
+    instance._display_changed = any(
+        old[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    caching.users_by_username.delete(
+        instance.username, getattr(instance, '_old_username', None)
+    )
+    if getattr(instance, '_display_changed', False):
+        # Фрагменты со ссылкой на старый профиль и старым именем.
+        group_ids = Post.objects.filter(
+            author=instance, group__isnull=False
+        ).order_by().values_list('group_id', flat=True).distinct()
+        caching.bump(
+            [
+                caching.generation_key(counts.ALL),
+                caching.generation_key(counts.AUTHOR, instance.pk),
+            ]
+            + [
+                caching.generation_key(counts.GROUP, group_id)
+                for group_id in group_ids
+            ]
+        )
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    caching.users_by_username.delete(instance.username)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(instance.user_id, instance.author_id)
+        stats.change_user(instance.user_id, following_count=1)
+        stats.change_user(instance.author_id, followers_count=1)
+        counts.invalidate(
+            [counts.scope_key(counts.FEED, instance.user_id)]
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_prune(sender, instance, **kwargs):
+    feed.prune(instance.user_id, instance.author_id)
+    stats.change_user(instance.user_id, following_count=-1)
+    stats.change_user(instance.author_id, followers_count=-1)
+    counts.invalidate([counts.scope_key(counts.FEED, instance.user_id)])
@@ -0,0 +1,139 @@
+"""Денормализованные счётчики: комментарии поста, посты группы,
+посты, подписчики и подписки пользователя.
+
+Сигналы сдвигают их одним UPDATE с F()-выражением, поэтому чтение
+счётчика — это поле уже загруженной строки. Расхождения (ручные правки
+базы, массовые операции без сигналов) исправляет reconcile_* по
+кускам; его запускает команда reconcile_counters.
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+CHUNK_SIZE = 1000
+
+
+def _shift(field, delta):
+    # Не уходим ниже нуля, даже если счётчик уже разошёлся с данными.
+    return Greatest(F(field) + delta, 0)
+
+
+def change_user(user_id, **deltas):
+    """Сдвигает счётчики пользователя.
+
+    Если строки ещё нет, её создаст for_user() или reconcile.
+    """
+    UserStats.objects.filter(user_id=user_id).update(
+        **{field: _shift(field, delta) for field, delta in deltas.items()}
+    )
+
+
+def change_group(group_id, delta):
+    if group_id:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=_shift('posts_count', delta)
+        )
+
+
+def change_post(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_shift('comments_count', delta)
+    )
+
+
+def for_user(user):
+    """Счётчики пользователя, строка создаётся при первом обращении.
+
+    Строка всегда читается из базы: user может быть общим объектом
+    из кэша, и закэшированный на нём user.stats был бы устаревшим.
+    """
+    try:
+        return UserStats.objects.get(user_id=user.pk)
+    except UserStats.DoesNotExist:
+        reconcile_users([user.pk])
+        return UserStats.objects.get(user_id=user.pk)
+
+
+def _count(model, field):
+    subquery = model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(subquery), 0)
+
+
+def _chunks(queryset, chunk_size):
+    last = None
+    while True:
+        page = queryset.order_by('pk')
+        if last is not None:
+            page = page.filter(pk__gt=last)
+        ids = list(page.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def reconcile_users(ids):
+    """Пересчитывает счётчики пользователей ids; возвращает число правок."""
+    fixed = 0
+    actual = User.objects.filter(pk__in=ids).annotate(
+        actual_posts=_count(Post, 'author'),
+        actual_followers=_count(Follow, 'author'),
+        actual_following=_count(Follow, 'user'),
+    ).values_list(
+        'pk', 'actual_posts', 'actual_followers', 'actual_following'
+    )
+    stored = UserStats.objects.in_bulk(ids)
+    for pk, posts, followers, following in actual:
+        row = stored.get(pk)
+        if row is not None and (
+            row.posts_count, row.followers_count, row.following_count
+        ) == (posts, followers, following):
+            continue
+        UserStats.objects.update_or_create(
+            user_id=pk,
+            defaults={
+                'posts_count': posts,
+                'followers_count': followers,
+                'following_count': following,
+            },
+        )
+        fixed += 1
+    return fixed
+
+
+def _reconcile_column(model, column, related_model, related_field, ids):
+    fixed = 0
+    rows = model.objects.filter(pk__in=ids).annotate(
+        actual=_count(related_model, related_field)
+    ).exclude(**{column: F('actual')}).values_list('pk', 'actual')
+    for pk, actual in rows:
+        model.objects.filter(pk=pk).update(**{column: actual})
+        fixed += 1
+    return fixed
+
+
+def reconcile(chunk_size=CHUNK_SIZE):
+    """Сверяет все счётчики кусками по chunk_size строк.
+
+    Каждый кусок — отдельная короткая транзакция. Возвращает словарь
+    с числом исправленных строк по таблицам.
+    """
+    report = {'users': 0, 'groups': 0, 'posts': 0}
+    for ids in _chunks(User.objects.all(), chunk_size):
+        with transaction.atomic():
+            report['users'] += reconcile_users(ids)
+    for ids in _chunks(Group.objects.all(), chunk_size):
+        with transaction.atomic():
+            report['groups'] += _reconcile_column(
+                Group, 'posts_count', Post, 'group', ids
+            )
+    for ids in _chunks(Post.objects.all(), chunk_size):
+        with transaction.atomic():
+            report['posts'] += _reconcile_column(
+                Post, 'comments_count', Comment, 'post', ids
+            )
+    return report
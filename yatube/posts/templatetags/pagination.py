@@ -0,0 +1,24 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def elided_page_range(page_obj):
+    return page_obj.paginator.get_elided_page_range(page_obj.number)
+
+
+@register.filter
+def next_cursor(page_obj):
+    """Токен ?after= от последней строки страницы по номеру или ''."""
+    if not page_obj.has_next() or not len(page_obj):
+        return ''
+    return page_obj.paginator.cursor_for(page_obj[-1]) or ''
+
+
+@register.filter
+def previous_cursor(page_obj):
+    """Токен ?before= от первой строки страницы по номеру или ''."""
+    if not page_obj.has_previous() or not len(page_obj):
+        return ''
+    return page_obj.paginator.cursor_for(page_obj[0]) or ''
@@ -0,0 +1,30 @@
+from django import template
+
+from posts import resize, thumbnails
+
+register = template.Library()
+
+# Ширина картинки в вёрстке: колонка col-md-9 или весь экран.
+SIZES = '(min-width: 992px) 960px, 100vw'
+
+
+@register.filter
+def with_thumbnails(posts):
+    """Посты страницы с post.thumbnail, найденными одним запросом."""
+    return thumbnails.resolve(posts)
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def picture(post):
+    """<picture> с вариантами миниатюры картинки поста."""
+    if not hasattr(post, 'thumbnail'):
+        thumbnails.resolve([post])
+    return {'thumbnail': post.thumbnail, 'sizes': SIZES}
+
+
+@register.simple_tag
+def resized(image, width, height, fit='cover', extension='jpg'):
+    """Подписанная ссылка на картинку ровно нужного размера."""
+    if not image:
+        return ''
+    return resize.url(image.name, width, height, fit, extension)
@@ -0,0 +1,43 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import advisor
+from ..models import Comment, Follow, Group, Post, User
+
+
+class IndexAdvisorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        group = Group.objects.create(title='Группа', slug='advisor')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for number in range(25):
+            post = Post.objects.create(
+                author=cls.author, text=f'Пост {number}', group=group
+            )
+        Comment.objects.create(post=post, author=cls.user, text='text')
+
+    def test_current_schema_needs_no_indexes(self):
+        """На текущей схеме страницы posts не требуют новых индексов."""
+        out = StringIO()
+        call_command('advise_indexes', '--check', stdout=out)
+        self.assertIn('Новые индексы не нужны', out.getvalue())
+
+    def test_suggests_equality_then_order_columns(self):
+        """Индекс: сначала условие равенства, затем сортировка."""
+        sql = (
+            'SELECT "posts_comment"."id", "posts_comment"."created" AS "d" '
+            'FROM "posts_comment" WHERE "posts_comment"."author_id" = 1 '
+            'ORDER BY "d" DESC LIMIT 10'
+        )
+        plan = [
+            'SCAN posts_comment',
+            'USE TEMP B-TREE FOR ORDER BY',
+        ]
+        suggestion = advisor.suggest(sql, advisor.problems(plan))
+        self.assertEqual(suggestion.model, Comment)
+        self.assertEqual(suggestion.fields, ('author', '-created'))
@@ -0,0 +1,69 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .. import counts
+from ..models import Follow, Group, Post, User
+
+
+class CountsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='counter')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='counted',
+            description='Описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_count_follows_signals(self):
+        """Закэшированный счётчик сдвигается при создании и удалении."""
+        key = counts.scope_key(counts.GROUP, self.group.pk)
+        queryset = self.group.posts.all()
+        self.assertEqual(counts.get_count(queryset, key), 0)
+        post = Post.objects.create(
+            author=self.user, text='text', group=self.group
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(counts.get_count(queryset, key), 1)
+        post.delete()
+        self.assertEqual(cache.get(key), 0)
+
+    def test_group_change_invalidates(self):
+        """Перенос поста в другую группу сбрасывает счётчик группы."""
+        key = counts.scope_key(counts.GROUP, self.group.pk)
+        post = Post.objects.create(author=self.user, text='text')
+        counts.get_count(self.group.posts.all(), key)
+        post.group = self.group
+        post.save()
+        self.assertEqual(counts.get_count(self.group.posts.all(), key), 1)
+
+    def test_new_post_drops_feed_counts(self):
+        """Счётчики лент подписчиков сбрасываются без incr на каждого."""
+        readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(3)
+        ]
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=self.user) for reader in readers
+        )
+        keys = [counts.scope_key(counts.FEED, user.pk) for user in readers]
+        cache.set_many(dict.fromkeys(keys, 5))
+        with mock.patch.object(cache, 'incr', wraps=cache.incr) as incr:
+            Post.objects.create(author=self.user, text='text')
+        self.assertFalse(
+            [call for call in incr.call_args_list if call.args[0] in keys]
+        )
+        self.assertEqual(cache.get_many(keys), {})
+
+    @override_settings(POSTS_COUNT_MODE=counts.ESTIMATED)
+    def test_estimated_falls_back_to_count(self):
+        """Без статистики планировщика оценка берётся из COUNT(*)."""
+        Post.objects.create(author=self.user, text='text')
+        key = counts.scope_key(counts.ALL)
+        self.assertEqual(counts.get_count(Post.objects.all(), key), 1)
@@ -0,0 +1,107 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import deletion
+from ..models import (
+    Comment, FeedEntry, Follow, Group, PendingDeletion, Post, User,
+    UserStats
+)
+
+
+class ChunkedDeletionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(title='Группа', slug='deletion')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.author, author=cls.reader)
+        cls.reader_post = Post.objects.create(
+            author=cls.reader, text='text', group=cls.group
+        )
+        Comment.objects.create(
+            post=cls.reader_post, author=cls.author, text='text'
+        )
+        for number in range(5):
+            post = Post.objects.create(
+                author=cls.author, text=f'Пост {number}', group=cls.group
+            )
+            Comment.objects.create(post=post, author=cls.reader, text='text')
+
+    def test_user_deleted_in_chunks(self):
+        """Пользователь и его каскад удаляются порциями по chunk_size."""
+        steps = []
+        pending = deletion.schedule(self.author)
+        self.assertFalse(User.objects.get(pk=self.author.pk).is_active)
+        deletion.process(
+            pending,
+            chunk_size=2,
+            progress=lambda pending, step, count: steps.append(count),
+        )
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertTrue(all(count <= 2 for count in steps))
+        self.assertEqual(list(Post.objects.all()), [self.reader_post])
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertFalse(PendingDeletion.objects.exists())
+        self.reader_post.refresh_from_db()
+        self.assertEqual(self.reader_post.comments_count, 0)
+        stats = UserStats.objects.get(user=self.reader)
+        self.assertEqual(
+            (stats.followers_count, stats.following_count), (0, 0)
+        )
+
+    def test_group_command_keeps_posts(self):
+        """Команда удаляет группу, посты остаются без группы."""
+        out = StringIO()
+        call_command(
+            'process_deletions', group=['deletion'], chunk_size=2, stdout=out
+        )
+        self.assertFalse(Group.objects.filter(slug='deletion').exists())
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertFalse(Post.objects.filter(group__isnull=False).exists())
+        self.assertIn('group', out.getvalue())
+
+
+class UserAdminDeletionTests(TestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        self.author = User.objects.create_user(username='prolific')
+        Post.objects.create(author=self.author, text='text')
+
+    def test_action_schedules_user(self):
+        """Действие в админке ставит автора в очередь, а не удаляет."""
+        response = self.client.post(
+            reverse('admin:auth_user_changelist'),
+            {
+                'action': 'schedule_deletion',
+                '_selected_action': [self.author.pk],
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(PendingDeletion.objects.filter(
+            kind=PendingDeletion.USER, object_id=self.author.pk
+        ).exists())
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.is_active)
+
+    def test_cascading_delete_is_disabled(self):
+        """Обычное и массовое удаление пользователей недоступны."""
+        response = self.client.get(reverse('admin:auth_user_changelist'))
+        form = response.context['action_form']
+        actions = dict(form.fields['action'].choices)
+        self.assertNotIn('delete_selected', actions)
+        self.assertIn('schedule_deletion', actions)
+        response = self.client.get(
+            reverse('admin:auth_user_delete', args=[self.author.pk])
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(User.objects.filter(pk=self.author.pk).exists())
@@ -10,7 +10,7 @@ from ..models import Group, Post, User, Comment
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostFormTest(TestCase):
     """Протестируем, что добавляется новый пользователь."""
 
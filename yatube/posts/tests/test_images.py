@@ -0,0 +1,145 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import resize
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def jpeg(size):
+    content = BytesIO()
+    Image.new('RGB', size, 'green').save(content, 'JPEG')
+    return content.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageMetadataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_metadata_is_computed_on_upload(self):
+        """Размеры, объём, хэш и заглушка считаются при загрузке."""
+        content = jpeg((64, 32))
+        post = Post.objects.create(
+            author=self.user,
+            text='text',
+            image=SimpleUploadedFile('green.jpg', content),
+        )
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual((post.image_width, post.image_height), (64, 32))
+        self.assertEqual(post.image_size, len(content))
+        self.assertEqual(
+            post.image_hash, hashlib.sha256(content).hexdigest()
+        )
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        post.image = ''
+        post.save(update_fields=['image'])
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_backfill_fills_existing_images(self):
+        """Команда заполняет сведения о ранее загруженных картинках."""
+        posts = []
+        for number in range(3):
+            name = Post.image.field.storage.save(
+                f'posts/old{number}.jpg', ContentFile(jpeg((30, 10)))
+            )
+            posts.append(
+                Post.objects.create(author=self.user, text='old', image=name)
+            )
+        self.assertEqual(posts[0].image_hash, '')
+        call_command('backfill_image_metadata', workers=2, stdout=StringIO())
+        for post in Post.objects.filter(pk__in=[p.pk for p in posts]):
+            self.assertEqual((post.image_width, post.image_height), (30, 10))
+            self.assertEqual(len(post.image_hash), 64)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    RESIZE_CACHE_DIR=os.path.join(TEMP_MEDIA_ROOT, 'resize_cache'),
+)
+class ResizedImageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.name = Post.image.field.storage.save(
+            'posts/wide.jpg', ContentFile(jpeg((400, 200)))
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_resized_image(self):
+        """Картинка отдаётся ровно нужного размера с вечным кэшем."""
+        url = resize.url(self.name, 120, 90, 'cover', 'webp')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        image = Image.open(BytesIO(response.content))
+        self.assertEqual((image.format, image.size), ('WEBP', (120, 90)))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_contain_keeps_proportions(self):
+        response = self.client.get(resize.url(self.name, 100, 100, 'contain'))
+        image = Image.open(BytesIO(response.content))
+        self.assertEqual(image.size, (100, 50))
+
+    def test_forged_or_invalid_urls_are_rejected(self):
+        url = resize.url(self.name, 120, 90)
+        signature, spec, name = url.strip('/').split('/', 3)[1:]
+        forged = [
+            url.replace(spec, '1200x900-cover.jpg'),
+            url.replace(signature, 'x' * len(signature)),
+            reverse(
+                'posts:resized_image',
+                args=[resize.signature('9999x1-cover.jpg', name),
+                      '9999x1-cover.jpg', name],
+            ),
+        ]
+        for url in forged:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    @override_settings(RESIZE_CACHE_MAX_BYTES=1)
+    def test_cache_is_bounded(self):
+        """Каталог не растёт сверх лимита: старые файлы удаляются."""
+        for width in (50, 60, 70):
+            response = self.client.get(resize.url(self.name, width, width))
+            self.assertEqual(response.status_code, 200)
+        files = [
+            name
+            for _, _, names in os.walk(settings.RESIZE_CACHE_DIR)
+            for name in names
+        ]
+        self.assertEqual(files, [])
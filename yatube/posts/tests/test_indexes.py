@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Follow, Group, Post, User
+
+
+class TimelineIndexTests(TestCase):
+    """Ленты читаются по составным индексам, без временной сортировки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(title='Группа', slug='timeline')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for number in range(15):
+            Post.objects.create(
+                author=cls.author, text=f'Пост {number}', group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def plans(self, url, data=None):
+        """EXPLAIN QUERY PLAN для выборок страницы постов."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, data)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'ORDER BY' not in sql:
+                    continue
+                if 'FROM "posts_post"' not in sql:
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plans.append(
+                    ' | '.join(str(row[-1]) for row in cursor.fetchall())
+                )
+        return plans
+
+    def test_list_views_do_not_sort(self):
+        """Страницы по номеру берут порядок из индекса."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            for data in (None, {'page': 2}):
+                with self.subTest(url=url, data=data):
+                    plans = self.plans(url, data)
+                    self.assertTrue(plans)
+                    for plan in plans:
+                        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_cursor_pages_do_not_sort(self):
+        """Курсорные страницы тоже обходятся без TEMP B-TREE."""
+        urls = (
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+        )
+        for url in urls:
+            first = self.client.get(url, {'after': 'start'})
+            cursor = first.context['page_obj'].next_cursor
+            with self.subTest(url=url):
+                plans = self.plans(url, {'after': cursor})
+                self.assertTrue(plans)
+                for plan in plans:
+                    self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,26 @@
+from django.test import SimpleTestCase
+
+from ..paginators import CountedPaginator
+
+
+class ElidedPageRangeTests(SimpleTestCase):
+    def test_short_range_is_not_elided(self):
+        """Немного страниц выводятся все."""
+        paginator = CountedPaginator(list(range(50)), 10)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(3)), [1, 2, 3, 4, 5]
+        )
+
+    def test_long_range_is_elided(self):
+        """Длинный диапазон сжимается до краёв и соседей текущей."""
+        paginator = CountedPaginator(list(range(100000)), 10)
+        ellipsis = CountedPaginator.ELLIPSIS
+        self.assertEqual(
+            list(paginator.get_elided_page_range(5000)),
+            [1, 2, ellipsis, 4997, 4998, 4999, 5000, 5001, 5002, 5003,
+             ellipsis, 9999, 10000],
+        )
+        self.assertEqual(
+            list(paginator.get_elided_page_range(1)),
+            [1, 2, 3, 4, ellipsis, 9999, 10000],
+        )
@@ -0,0 +1,75 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User, UserStats
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(title='Группа', slug='stats')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        post = Post.objects.create(
+            author=self.author, text='text', group=self.group
+        )
+        Comment.objects.create(post=post, author=self.user, text='text')
+        Follow.objects.create(user=self.user, author=self.author)
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+
+        post.group = None
+        post.save()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        Follow.objects.all().delete()
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+
+    def test_reconcile_command_fixes_drift(self):
+        """reconcile_counters возвращает счётчики к реальным значениям."""
+        post = Post.objects.create(
+            author=self.author, text='text', group=self.group
+        )
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        UserStats.objects.filter(user=self.user).delete()
+        Post.objects.filter(pk=post.pk).update(comments_count=3)
+        out = StringIO()
+        call_command('reconcile_counters', chunk_size=1, stdout=out)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.user).posts_count, 0)
+        self.assertIn('users: исправлено 2', out.getvalue())
+
+    def test_profile_shows_fresh_counters(self):
+        """Профиль сразу после подписки и поста показывает новые числа."""
+        cache.clear()
+        self.client.force_login(self.user)
+        url = reverse('posts:profile', args=[self.author.username])
+        self.assertContains(self.client.get(url), 'Подписчиков: 0')
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        Post.objects.create(author=self.author, text='text')
+        response = self.client.get(url)
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertContains(response, 'Всего постов: 1')
@@ -0,0 +1,186 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from .. import caching, thumbnails
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=2)
+class PregeneratedThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        content = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(content, 'JPEG')
+        cls.post = Post.objects.create(
+            author=User.objects.create_user(username='writer'),
+            text='text',
+            image=SimpleUploadedFile('red.jpg', content.getvalue()),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        geometry, options = thumbnails.GEOMETRIES[0]
+        self.geometry = geometry
+        self.options = options
+
+    def thumbnail(self):
+        return get_thumbnail(self.post.image, self.geometry, **self.options)
+
+    def test_render_does_not_generate(self):
+        """Без готовой миниатюры отдаётся исходник, задача ставится раз."""
+        with mock.patch.object(thumbnails, '_pool') as pool:
+            self.assertEqual(self.thumbnail().url, self.post.image.url)
+            self.thumbnail()
+        pool.return_value.submit.assert_called_once_with(
+            thumbnails.generate,
+            self.post.image.name,
+            self.geometry,
+            self.options,
+        )
+
+    def test_generated_thumbnail_is_served(self):
+        """После генерации шаблоны получают миниатюру нужного размера."""
+        thumbnails.generate(
+            self.post.image.name, self.geometry, dict(self.options)
+        )
+        thumbnail = self.thumbnail()
+        self.assertNotEqual(thumbnail.url, self.post.image.url)
+        self.assertEqual((thumbnail.width, thumbnail.height), (960, 339))
+
+    def test_generated_thumbnail_refreshes_pages(self):
+        """Готовая миниатюра сбрасывает фрагменты страниц с постом."""
+        keys = caching.post_generation_keys(self.post)
+        before = caching.get_generations(keys)
+        thumbnails.generate(
+            self.post.image.name, self.geometry, dict(self.options)
+        )
+        after = caching.get_generations(keys)
+        for old, new in zip(before, after):
+            self.assertGreater(new, old)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ResolveThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='painter')
+        for number in range(5):
+            content = BytesIO()
+            Image.new('RGB', (40, 20), 'blue').save(content, 'JPEG')
+            Post.objects.create(
+                author=author,
+                text=f'text {number}',
+                image=SimpleUploadedFile(
+                    f'blue{number}.jpg', content.getvalue()
+                ),
+            )
+        Post.objects.create(author=author, text='no image')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def kvstore_queries(self, posts):
+        with CaptureQueriesContext(connection) as queries:
+            resolved = thumbnails.resolve(posts)
+        return resolved, [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+
+    def test_page_is_resolved_with_one_query(self):
+        """Холодный кэш: один запрос к kvstore на всю страницу."""
+        posts = list(Post.objects.all())
+        for post in posts:
+            if post.image:
+                thumbnails.pregenerate(post.image.name)
+        cache.clear()
+        resolved, queries = self.kvstore_queries(posts)
+        self.assertEqual(len(queries), 1)
+        for post in resolved:
+            if not post.image:
+                self.assertIsNone(post.thumbnail)
+                continue
+            self.assertNotEqual(post.thumbnail.url, post.image.url)
+            self.assertEqual(
+                (post.thumbnail.width, post.thumbnail.height), (960, 339)
+            )
+        _, queries = self.kvstore_queries(posts)
+        self.assertEqual(queries, [])
+
+    def test_missing_thumbnails_fall_back_to_source(self):
+        """Без миниатюры отдаётся исходник, а генерация ставится."""
+        posts = list(Post.objects.exclude(image=''))
+        with mock.patch.object(thumbnails, 'enqueue') as enqueue:
+            resolved = thumbnails.resolve(posts)
+        self.assertEqual(
+            enqueue.call_count, len(posts) * len(thumbnails.GEOMETRIES)
+        )
+        for post in resolved:
+            self.assertEqual(post.thumbnail.url, post.image.url)
+            self.assertEqual(
+                (post.thumbnail.width, post.thumbnail.height), (40, 20)
+            )
+            self.assertTrue(post.thumbnail.placeholder)
+            self.assertEqual(post.thumbnail.srcset, '')
+            self.assertEqual(post.thumbnail.sources, ())
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_render_never_generates_inline(self):
+        """Без пула отрисовка не создаёт миниатюры сама."""
+        with mock.patch.object(thumbnails, 'generate') as generate:
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        generate.assert_not_called()
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_index_renders_resolved_thumbnails(self):
+        """Миниатюры страницы укладываются в бюджет запросов index."""
+        for post in Post.objects.exclude(image=''):
+            thumbnails.pregenerate(post.image.name)
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'width="960" height="339"')
+
+    def test_page_offers_smaller_variants(self):
+        """<picture> предлагает 480 и 960 пикселей в каждом формате."""
+        post = Post.objects.exclude(image='').first()
+        thumbnails.pregenerate(post.image.name)
+        cache.clear()
+        [post] = thumbnails.resolve([post])
+        self.assertIn(' 480w, ', post.thumbnail.srcset)
+        self.assertTrue(post.thumbnail.srcset.endswith(' 960w'))
+        self.assertEqual(
+            [source.type for source in post.thumbnail.sources],
+            [thumbnails.MIME_TYPES[name] for name in thumbnails.FORMATS],
+        )
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        for source in post.thumbnail.sources:
+            self.assertContains(response, source.srcset)
@@ -1,12 +1,28 @@
+from io import BytesIO, StringIO
+import shutil
+import tempfile
 import time
 
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
+from PIL import Image
 
-from ..models import Group, Post, User, Follow
+from core.query_budget import QueryBudgetExceeded, query_budget
+
+from .. import caching, counts
+
+from ..models import (
+    Comment, FeedEntry, Follow, Group, Post, User, UserStats
+)
+from ..paginators import CountedPaginator
 
 
 class PostPagesTests(TestCase):
@@ -204,6 +220,63 @@ class PaginatorTests(TestCase):
                     PaginatorTests.POST_IN_PAGE_2
                 )
 
+    def test_cursor_paginator(self):
+        """Keyset-пагинация проходит все посты без повторов."""
+        for test in PaginatorTests.paginator_test:
+            with self.subTest(test=test):
+                first = self.client.get(test).context['page_obj']
+                page = self.client.get(test, {'after': 'broken'}).context[
+                    'page_obj'
+                ]
+                self.assertFalse(page.has_previous())
+                self.assertEqual(list(page), list(first))
+                token = page.next_cursor
+                page_2 = self.client.get(test, {'after': token}).context[
+                    'page_obj'
+                ]
+                self.assertEqual(
+                    len(page_2), PaginatorTests.POST_IN_PAGE_2
+                )
+                self.assertFalse(page_2.has_next())
+                back = self.client.get(
+                    test, {'before': page_2.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back), list(first))
+
+    def test_numbered_pages_link_into_cursor_mode(self):
+        """«Следующая» и «Предыдущая» ведут на курсорные страницы."""
+        for test in PaginatorTests.paginator_test:
+            with self.subTest(test=test):
+                first = self.client.get(test)
+                token = first.context['page_obj'].paginator.cursor_for(
+                    first.context['page_obj'][-1]
+                )
+                self.assertContains(first, f'?after={token}')
+                second = self.client.get(test, {'after': token})
+                self.assertEqual(
+                    list(second.context['page_obj']),
+                    list(self.client.get(test, {'page': 2}).context[
+                        'page_obj'
+                    ]),
+                )
+                numbered = self.client.get(test, {'page': 2})
+                token = numbered.context['page_obj'].paginator.cursor_for(
+                    numbered.context['page_obj'][0]
+                )
+                self.assertContains(numbered, f'?before={token}')
+
+    def test_count_ignores_cursor_annotation(self):
+        """COUNT(*) идёт по исходному queryset, без подзапроса."""
+        paginator = CountedPaginator(
+            Post.objects.all(), 10, cursor_field='pub_date'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(paginator.count, 13)
+        [query] = queries.captured_queries
+        self.assertNotIn('FROM (SELECT', query['sql'])
+        post = paginator.page(2)[0]
+        self.assertEqual(post.cursor_date, post.pub_date)
+
 
 class CacheTests(TestCase):
     @classmethod
@@ -247,15 +320,39 @@ class CacheTests(TestCase):
             PostPagesTests.templates_pages_names['posts/index.html']
         )
         cache_post = response.content
-        post.delete()
         response = self.authorized_author.get(
             PostPagesTests.templates_pages_names['posts/index.html']
         )
         self.assertEqual(response.content, cache_post)
-        self.cache.clear()
+        post.delete()
         response = self.authorized_author.get(reverse('posts:index'))
         self.assertNotEqual(response.content, cache_post)
 
+    def test_cache_reads_no_posts_on_hit(self):
+        """Повторный запрос главной берёт список постов из кэша."""
+        self.cache.clear()
+        self.guest_client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.text)
+
+    def test_group_edit_invalidates_page(self):
+        """Изменение группы сбрасывает кэш страниц группы и главной."""
+        self.cache.clear()
+        group = Group.objects.create(title='Старое', slug='gen')
+        Post.objects.create(author=self.author, text='text', group=group)
+        self.assertContains(
+            self.guest_client.get(reverse('posts:index')), '/group/gen/'
+        )
+        group.slug = 'gen-new'
+        group.save()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, '/group/gen-new/')
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': 'gen-new'})
+        )
+        self.assertContains(response, '/group/gen-new/')
+
     class FollowTests(TestCase):
 
         COUNT_FOLLOW_POST = 1
@@ -341,3 +438,278 @@ class CacheTests(TestCase):
 
             first_object = response.context.get('page_obj').object_list[0]
             self.assertEqual(first_object, new_post_author)
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    QUERY_BUDGET_STRICT=True,
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_WORKERS=0,
+)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='budget')
+        cls.group = Group.objects.create(title='Группа', slug='budget')
+        for i in range(10):
+            author = User.objects.create_user(username=f'author{i}')
+            Follow.objects.create(user=cls.user, author=author)
+            Post.objects.create(author=author, text='text', group=cls.group)
+            Post.objects.create(author=cls.user, text='text', group=cls.group)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_list_views_fit_budget(self):
+        """Страницы со списками постов укладываются в бюджет запросов."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'budget'}),
+            reverse('posts:profile', kwargs={'username': 'author0'}),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_post_detail_does_not_grow_with_comments(self):
+        """Число запросов post_detail не зависит от числа комментариев."""
+        post = Post.objects.filter(author=self.user).first()
+        for author in User.objects.exclude(pk=self.user.pk):
+            Comment.objects.create(post=post, author=author, text='text')
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(response, 'author9')
+
+    def test_post_detail_with_image_fits_budget(self):
+        """Пост с картинкой и холодным kvstore укладывается в бюджет."""
+        content = BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(content, 'JPEG')
+        post = Post.objects.create(
+            author=self.user,
+            text='text',
+            group=self.group,
+            image=SimpleUploadedFile('red.jpg', content.getvalue()),
+        )
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(response, post.image.url)
+
+    def test_budget_violation_raises(self):
+        """Превышение бюджета в строгом режиме — ошибка."""
+        @query_budget(0)
+        def view(request):
+            return list(User.objects.all())
+
+        with self.assertRaises(QueryBudgetExceeded):
+            view(None)
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commenter')
+        cls.post = Post.objects.create(author=cls.user, text='text')
+        for i in range(25):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'comment {i}'
+            )
+
+    def test_detail_shows_first_batch(self):
+        """На странице поста только первая порция комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertEqual(comments[0].text, 'comment 0')
+        self.assertContains(response, 'js-more-comments')
+
+    def test_partial_endpoint_returns_next_batch(self):
+        """Частичный ответ отдаёт следующую порцию без ссылки «ещё»."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        first = self.client.get(url).context['comments']
+        response = self.client.get(url, {'after': first.next_cursor})
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'comment {i}' for i in range(20, 25)],
+        )
+        self.assertNotContains(response, 'js-more-comments')
+        self.assertNotContains(response, '<html')
+
+    def test_partial_endpoint_unknown_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 999})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ObjectCacheTests(TestCase):
+    def test_renamed_group_is_not_served_from_cache(self):
+        """Смена slug группы сбрасывает кэш поиска по старому slug."""
+        group = Group.objects.create(title='Группа', slug='old-slug')
+        url = reverse('posts:group_list', kwargs={'slug': 'old-slug'})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        group.slug = 'new-slug'
+        group.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_renamed_author_is_not_served_from_fragments(self):
+        """После переименования автора ленты ссылаются на новый профиль."""
+        author = User.objects.create_user(username='old-name')
+        group = Group.objects.create(title='Группа', slug='renamed')
+        Post.objects.create(author=author, text='text', group=group)
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'renamed'}),
+        ]
+        for url in urls:
+            self.assertContains(self.client.get(url), '/profile/old-name/')
+        author.username = 'new-name'
+        author.save()
+        urls.append(reverse('posts:profile', kwargs={'username': 'new-name'}))
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, '/profile/new-name/')
+                self.assertNotContains(response, '/profile/old-name/')
+
+    def test_profile_lookup_is_cached(self):
+        """Повторный поиск автора по username не обращается к базе.
+
+        Читаются только свежие счётчики автора.
+        """
+        User.objects.create_user(username='cached')
+        url = reverse('posts:profile', kwargs={'username': 'cached'})
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('posts_userstats', queries[0]['sql'])
+
+    def test_cached_user_has_no_credentials(self):
+        """В общий кэш не попадают хэш пароля и email."""
+        User.objects.create_user(
+            username='private', email='private@example.com', password='pass'
+        )
+        caching.get_user_by_username('private')
+        cached = caching.users_by_username.cache.get(
+            caching.users_by_username.make_key('private')
+        )
+        self.assertEqual(cached.username, 'private')
+        self.assertNotIn('password', vars(cached))
+        self.assertNotIn('email', vars(cached))
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.old_post = Post.objects.create(author=cls.author, text='old')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def feed(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет старые посты в ленту, отписка убирает."""
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertEqual(self.feed(), [self.old_post])
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertEqual(self.feed(), [])
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    def test_new_post_fans_out(self):
+        """Новый пост автора попадает в ленту подписчика первым."""
+        Follow.objects.create(user=self.user, author=self.author)
+        time.sleep(0.001)
+        new_post = Post.objects.create(author=self.author, text='new')
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_rebuild_feed_command(self):
+        """Команда rebuild_feed восстанавливает ленту из подписок."""
+        Follow.objects.create(user=self.user, author=self.author)
+        FeedEntry.objects.all().delete()
+        key = counts.scope_key(counts.FEED, self.user.pk)
+        cache.set(key, 0)
+        call_command('rebuild_feed', stdout=StringIO())
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(self.feed(), [self.old_post])
+
+    def test_repeated_follow_is_idempotent(self):
+        """Повторная подписка не создаёт дубликат и не сдвигает счётчики."""
+        url = reverse('posts:profile_follow', args=[self.author.username])
+        self.authorized_client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertRedirects(
+            response,
+            reverse('posts:profile', args=[self.author.username]),
+        )
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1
+        )
+        self.assertEqual(self.feed(), [self.old_post])
+
+
+class ExcerptTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(
+            author=cls.author, text='слово ' * 200 + 'окончание'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_list_renders_excerpt_without_text(self):
+        """Список не загружает text и показывает только анонс."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'окончание')
+        self.assertContains(response, self.post.excerpt)
+        self.assertFalse(any(
+            '"posts_post"."text"' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+    def test_detail_renders_full_text(self):
+        """Полный текст выводится на странице поста."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertContains(response, 'окончание')
+
+    def test_excerpt_follows_text_updates(self):
+        """Анонс пересчитывается и при save(update_fields=['text'])."""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'новый текст'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, 'новый текст')
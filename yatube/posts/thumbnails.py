@@ -0,0 +1,282 @@
+"""Миниатюры готовятся заранее в пуле процессов.
+
+Шаблоны просят {% thumbnail %} у PregeneratedBackend: если миниатюра
+уже есть в kvstore sorl, она отдаётся как обычно, иначе вместо неё
+отдаётся исходная картинка, а генерация ставится в очередь. Поэтому
+отрисовка страницы никогда не ждёт PIL. Новые и изменённые посты
+ставят в очередь все размеры из GEOMETRIES сразу после коммита.
+
+Одна и та же миниатюра генерируется одним процессом: задача
+ставится, только если удалось занять ключ в общем кэше (cache.add).
+Готовая миниатюра увеличивает поколения страниц со своим постом,
+и закэшированные фрагменты с исходником перестают отдаваться.
+
+Списки постов берут миниатюры всей страницы через resolve(): один
+get_many к кэшу kvstore и, для промахов, один запрос к его таблице.
+
+Кроме базовой миниатюры готовятся варианты для <picture>: две ширины
+в JPEG, WebP и AVIF (если Pillow умеет их сохранять). Браузер выбирает
+формат и ширину сам, телефоны получают вдвое меньшую картинку.
+"""
+import logging
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core.processes import fork_pool
+
+from . import caching
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+Image.init()
+# Современные форматы по убыванию сжатия; AVIF есть не во всех сборках.
+FORMATS = tuple(name for name in ('AVIF', 'WEBP') if name in Image.SAVE)
+# sorl знает расширения только JPEG, PNG, GIF и WEBP.
+EXTENSIONS.setdefault('AVIF', 'avif')
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+    'AVIF': 'image/avif',
+}
+QUALITY = {'WEBP': 75, 'AVIF': 55}
+CROP = {'crop': 'center', 'upscale': True}
+WIDTHS = ('480x170', '960x339')
+# Все размеры, которые используют шаблоны постов; первый — <img src>.
+GEOMETRIES = (
+    ('960x339', CROP),
+    ('480x170', CROP),
+) + tuple(
+    (geometry, {**CROP, 'format': name, 'quality': QUALITY[name]})
+    for name in FORMATS
+    for geometry in WIDTHS
+)
+# Сколько держится отметка «уже в очереди», если процесс упал.
+LOCK_TIMEOUT = 5 * 60
+
+# Что получают шаблоны. Пока миниатюры нет, это исходник с размерами
+# из строки поста; placeholder — заглушка LQIP (posts.images);
+# srcset — готовые JPEG-варианты, sources — <source> других форматов.
+Thumbnail = namedtuple(
+    'Thumbnail', 'url width height placeholder srcset sources'
+)
+Source = namedtuple('Source', 'type srcset')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = fork_pool(getattr(settings, 'THUMBNAIL_WORKERS', 2))
+        return _executor
+
+
+def lock_key(name, geometry, options):
+    return f'thumbnail:pending:{tokey(name, geometry, serialize(options))}'
+
+
+def generate(name, geometry, options):
+    """Создаёт миниатюру и запись в kvstore; выполняется в пуле."""
+    try:
+        ThumbnailBackend().get_thumbnail(name, geometry, **options)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+    else:
+        refresh(name)
+    finally:
+        cache.delete(lock_key(name, geometry, options))
+
+
+def refresh(name):
+    """Новые поколения страниц с постами, у которых картинка name.
+
+    Пока миниатюры не было, фрагменты отрисованы с исходником; без
+    этого они оставались бы в кэше до истечения TTL.
+    """
+    keys = set()
+    for post in Post.objects.filter(image=name).only('author', 'group'):
+        keys.update(caching.post_generation_keys(post))
+    caching.bump(sorted(keys))
+
+
+def enqueue(name, geometry, options, inline=False):
+    """Ставит генерацию в пул, если её ещё никто не поставил.
+
+    Без пула (THUMBNAIL_WORKERS = 0: тесты, отладка) миниатюра
+    создаётся сразу, но только при inline=True — из pregenerate после
+    коммита. Отрисовка страниц PIL не ждёт и в этом режиме.
+    """
+    workers = getattr(settings, 'THUMBNAIL_WORKERS', 2)
+    if not workers and not inline:
+        return False
+    if not cache.add(lock_key(name, geometry, options), 1, LOCK_TIMEOUT):
+        return False
+    try:
+        exists = default.storage.exists(name)
+    except (SuspiciousFileOperation, OSError):
+        exists = False
+    if not exists:
+        # Отметка остаётся: несуществующий файл не проверяется
+        # на каждой отрисовке.
+        return False
+    if workers:
+        _pool().submit(generate, name, geometry, options)
+    else:
+        generate(name, geometry, options)
+    return True
+
+
+def pregenerate(name):
+    """Ставит в очередь все размеры из GEOMETRIES для картинки."""
+    for geometry, options in GEOMETRIES:
+        enqueue(name, geometry, dict(options), inline=True)
+
+
+class PregeneratedBackend(ThumbnailBackend):
+    """Backend sorl, который не генерирует миниатюры при отрисовке."""
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source = ImageFile(file_)
+        cached = default.kvstore.get(
+            self.thumbnail_file(source, geometry_string, options)
+        )
+        if cached:
+            return cached
+        enqueue(source.name, geometry_string, options)
+        return source
+
+    def thumbnail_file(self, source, geometry_string, options):
+        """ImageFile будущей миниатюры, без обращения к хранилищам."""
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self._full_options(source, dict(options))
+        )
+        return ImageFile(name, default.storage)
+
+    def _full_options(self, source, options):
+        # Те же значения по умолчанию, что в ThumbnailBackend.get_thumbnail,
+        # иначе имя файла миниатюры не совпадёт.
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+
+class BatchedKVStore(cached_db_kvstore.KVStore):
+    """kvstore sorl с пакетным чтением."""
+
+    def get_many(self, image_files):
+        """{имя файла: ImageFile} для найденных записей."""
+        keys = {add_prefix(image.key): image for image in image_files}
+        values = self.cache.get_many(list(keys))
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = dict(
+                KVStoreModel.objects.filter(
+                    key__in=missing
+                ).values_list('key', 'value')
+            )
+            # Как в _get_raw: отсутствие тоже кэшируется.
+            fetched = {
+                key: found.get(key, cached_db_kvstore.EMPTY_VALUE)
+                for key in missing
+            }
+            self.cache.set_many(
+                fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            values.update(fetched)
+        return {
+            keys[key].name: deserialize_image_file(value)
+            for key, value in values.items()
+            if value and value != cached_db_kvstore.EMPTY_VALUE
+        }
+
+
+def resolve(posts):
+    """Проставляет post.thumbnail всем постам страницы одним чтением.
+
+    Для постов без картинки thumbnail = None; если миниатюры ещё нет,
+    отдаётся исходник, а генерация ставится в очередь. Варианты,
+    которых ещё нет, в srcset не попадают. Хранилище картинок
+    не читается.
+    """
+    posts = list(posts)
+    files = {}
+    for post in posts:
+        post.thumbnail = None
+        if post.image:
+            source = ImageFile(post.image)
+            files[post.pk] = source, [
+                default.backend.thumbnail_file(source, geometry, options)
+                for geometry, options in GEOMETRIES
+            ]
+    found = default.kvstore.get_many(
+        thumbnail
+        for _, thumbnails in files.values()
+        for thumbnail in thumbnails
+    )
+    for post in posts:
+        if post.pk not in files:
+            continue
+        source, thumbnails = files[post.pk]
+        ready = {}
+        for (geometry, options), thumbnail in zip(GEOMETRIES, thumbnails):
+            cached = found.get(thumbnail.name)
+            if cached is None:
+                enqueue(source.name, geometry, dict(options))
+            else:
+                ready[geometry, options.get('format', 'JPEG')] = cached
+        post.thumbnail = _thumbnail(post, source, ready)
+    return posts
+
+
+def _srcset(images):
+    return ', '.join(
+        f'{image.url} {image.width}w'
+        for image in sorted(images, key=lambda image: image.width)
+    )
+
+
+def _thumbnail(post, source, ready):
+    by_format = {}
+    for (_, name), image in ready.items():
+        by_format.setdefault(name, []).append(image)
+    base = ready.get((GEOMETRIES[0][0], 'JPEG'))
+    if base is None:
+        # Исходник другого размера с вариантами в srcset не смешивается.
+        url, width, height = source.url, post.image_width, post.image_height
+        srcset = ''
+    else:
+        url, width, height = base.url, base.width, base.height
+        srcset = _srcset(by_format.get('JPEG', ()))
+    sources = tuple(
+        Source(MIME_TYPES[name], _srcset(by_format[name]))
+        for name in FORMATS
+        if name in by_format
+    )
+    return Thumbnail(
+        url, width, height, post.image_placeholder, srcset, sources
+    )
@@ -1,41 +1,90 @@
-from django.core.paginator import Paginator
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
 
+from core.db import routers
+from core.query_budget import query_budget
+
+from . import caching, counts, resize, stats
+from .feed import feed_posts
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
+from .models import Comment, Post, Follow
+from .paginators import CountedPaginator, CursorPaginator
 
 POSTS_PER_PAGE = 10
-
-
-def paginator(request, post_list):
-    post = Paginator(post_list, POSTS_PER_PAGE)
+COMMENTS_PER_PAGE = 20
+# Ответ по подписанной ссылке не меняется: кэшировать можно на год.
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def paginator(request, post_list, count_key=None, cursor_field='pub_date'):
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before:
+        # Строки курсорной страницы входят в ключ фрагмента кэша.
+        with routers.primary():
+            return CursorPaginator(
+                post_list, POSTS_PER_PAGE, cursor_field
+            ).get_page(after=after, before=before)
+    post = CountedPaginator(
+        post_list, POSTS_PER_PAGE, count_key, cursor_field
+    )
     page_number = request.GET.get('page')
     page_obj = post.get_page(page_number)
     return page_obj
 
 
+def comments_page(request, post_id):
+    comments = Comment.objects.filter(post_id=post_id).select_related('author')
+    return CursorPaginator(
+        comments, COMMENTS_PER_PAGE, 'created', descending=False
+    ).get_page(
+        after=request.GET.get('after'), before=request.GET.get('before')
+    )
+
+
+@query_budget(5)
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.select_related('author', 'group').defer('text')
+    page_obj = paginator(request, post_list, counts.scope_key(counts.ALL))
     context = {
-        'page_obj': paginator(request, post_list),
+        'page_obj': page_obj,
+        'feed_cache_key': caching.page_cache_key(
+            page_obj, caching.generation_key(counts.ALL)
+        ),
+        'feed_cache_timeout': caching.FEED_CACHE_TIMEOUT,
     }
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(6)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    group = caching.get_group_by_slug(slug)
+    post_list = group.posts.select_related('author', 'group').defer('text')
+    page_obj = paginator(
+        request, post_list, counts.scope_key(counts.GROUP, group.pk)
+    )
     context = {
         'group': group,
-        'page_obj': paginator(request, post_list)
+        'page_obj': page_obj,
+        'feed_cache_key': caching.page_cache_key(
+            page_obj, caching.generation_key(counts.GROUP, group.pk)
+        ),
+        'feed_cache_timeout': caching.FEED_CACHE_TIMEOUT,
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(8)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
+    author = caching.get_user_by_username(username)
+    post_list = author.posts.select_related(
+        'author', 'group'
+    ).defer('text')
     if request.user.is_authenticated and request.user != author:
         following = Follow.objects.filter(
             user=request.user,
@@ -43,26 +92,49 @@ def profile(request, username):
         ).exists()
     else:
         following = False
+    page_obj = paginator(
+        request, post_list, counts.scope_key(counts.AUTHOR, author.pk)
+    )
     context = {
         'following': following,
-        'page_obj': paginator(request, post_list),
+        'page_obj': page_obj,
         'author': author,
+        'author_stats': stats.for_user(author),
+        'feed_cache_key': caching.page_cache_key(
+            page_obj, caching.generation_key(counts.AUTHOR, author.pk)
+        ),
+        'feed_cache_timeout': caching.FEED_CACHE_TIMEOUT,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(6)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
+    comments = comments_page(request, post.pk)
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
+        'author_posts_count': stats.for_user(post.author).posts_count,
         'form': form,
         'comments': comments
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(2)
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404('Пост не найден')
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(request, post_id),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -110,28 +182,65 @@ def add_comment(request, post_id):
 
 
 @login_required
+@query_budget(4)
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    context = {'page_obj': paginator(request, post_list)}
+    post_list = feed_posts(request.user).defer('text')
+    context = {
+        'page_obj': paginator(
+            request,
+            post_list,
+            counts.scope_key(counts.FEED, request.user.pk),
+            cursor_field='feed_entries__pub_date',
+        )
+    }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = caching.get_user_by_username(username)
+    routers.stick(request)
     if request.user != author:
-        Follow.objects.get_or_create(
-            user=request.user,
-            author=author,
-        )
+        # Один INSERT вместо SELECT + INSERT; повторная или параллельная
+        # подписка упирается в unique_follow и ничего не меняет.
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=request.user, author=author)
+        except IntegrityError:
+            pass
     return redirect('posts:profile', username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = caching.get_user_by_username(username)
+    routers.stick(request)
     Follow.objects.filter(
         user=request.user,
         author=author,
     ).delete()
     return redirect('posts:profile', username=author.username)
+
+
+@require_safe
+@query_budget(0)
+def resized_image(request, signature, spec, name):
+    try:
+        *_, extension = resize.parse(spec)
+    except resize.InvalidSpec:
+        raise Http404
+    if not resize.verify(signature, spec, name):
+        raise Http404
+    etag = f'"{resize.etag(spec, name)}"'
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            content = resize.get(spec, name)
+        except (SuspiciousFileOperation, OSError):
+            raise Http404
+        _, content_type, _ = resize.EXTENSIONS[extension]
+        response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    response['Cache-Control'] = IMMUTABLE
+    return response
@@ -10,7 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -61,6 +65,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.PrimaryStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -95,13 +100,36 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# PRAGMA для каждого соединения см. core.db.sqlite3.base.DEFAULT_PRAGMAS;
+# переопределяются через OPTIONS['pragmas'].
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Реплика для чтения. Локально это может быть копия основного файла:
+#   sqlite3 db.sqlite3 ".backup replica.sqlite3"
+#   YATUBE_REPLICA_DB=replica.sqlite3 python manage.py runserver
+# Без переменной чтения идут в default.
+REPLICA_DB = os.environ.get('YATUBE_REPLICA_DB')
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'NAME': REPLICA_DB or DATABASES['default']['NAME'],
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_REPLICAS = ['replica'] if REPLICA_DB else []
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+# Сколько секунд после записи клиент читает из основной базы.
+REPLICA_STICKY_SECONDS = 10
+REPLICA_STICKY_COOKIE = 'use_primary'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -146,8 +174,44 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Один файл кэша на узел: его видят все воркеры, а не каждый свой.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
+
+# Тесты (manage.py test и pytest) получают свой временный файл кэша
+# и не видят и не чистят кэш запущенного сайта.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    TEST_CACHE_DIR = tempfile.mkdtemp(prefix='yatube-cache-')
+    atexit.register(shutil.rmtree, TEST_CACHE_DIR, ignore_errors=True)
+    CACHES['default']['LOCATION'] = os.path.join(
+        TEST_CACHE_DIR, 'cache.sqlite3'
+    )
+
+# Миниатюры генерируются в пуле процессов, а не при отрисовке;
+# при THUMBNAIL_WORKERS = 0 — в текущем процессе после коммита поста,
+# но не при отрисовке страниц.
+# Списки постов читают kvstore одним пакетом на страницу.
+THUMBNAIL_BACKEND = 'posts.thumbnails.PregeneratedBackend'
+THUMBNAIL_KVSTORE = 'posts.thumbnails.BatchedKVStore'
+THUMBNAIL_WORKERS = 2
+
+# Картинки произвольного размера по подписанным ссылкам (posts.resize):
+# каталог с готовыми файлами и его предельный объём.
+RESIZE_CACHE_DIR = os.path.join(BASE_DIR, 'resize_cache')
+RESIZE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Режим подсчёта постов для пагинатора: exact, cached или estimated
+POSTS_COUNT_MODE = 'cached'
+
+# Превышение бюджета SQL-запросов представления (core.query_budget):
+# при True — исключение, иначе запись в лог. Тесты бюджетов включают
+# строгий режим через override_settings.
+QUERY_BUDGET_STRICT = False